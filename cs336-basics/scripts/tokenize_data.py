@@ -1,17 +1,21 @@
-import pandas as pd
-import numpy as np
-from tqdm import tqdm
-from transformers import GPT2TokenizerFast
+#!/usr/bin/env python3
+"""
+Tokenize filtered parquet data into a flat uint16 token id file for training.
 
-data_path = "/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/flitered_data/CC-MAIN-20251005114239-20251005144239-00000.warc.parquet"
-tokenized_data_path = "/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-basics/tokenized_data/tokenized_data.bin"
-tokenizer = GPT2TokenizerFast.from_pretrained("gpt2")
+```
+python scripts/tokenize_data.py 'filtered_data/*.parquet' --output tokenized_data/tokenized_data.bin
+```
 
-df = pd.read_parquet(data_path)
-ids_array = []
-for text in tqdm(df["text"]):
-    ids = tokenizer.encode(text + tokenizer.eos_token)
-    ids_array.extend(ids)
+Same as `cs336-data tokenize ...`.
+"""
+import sys
 
-ids_array = np.array(ids_array, dtype=np.uint16)
-ids_array.tofile(tokenized_data_path)
\ No newline at end of file
+from cs336_data.cli import main as cli_main
+
+
+def main(argv=None):
+    cli_main(["tokenize", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Command-line entry point of the data pipeline.
+
+```
+cs336-data filter 'data/CC-MAIN-*.warc.gz' --output-dir filtered --num-workers 32
+cs336-data dedup-exact 'filtered/*.parquet' --output-dir deduped_lines
+cs336-data dedup-fuzzy 'deduped_lines/*.parquet' --output-dir deduped
+cs336-data tokenize 'deduped/*.parquet' --output tokens.bin
+```
+
+Every subcommand also reads its options from its section of a JSON `--config`
+file ("filter", "dedup_exact", "dedup_fuzzy" or "tokenize", keyed like the
+flags with underscores, e.g. {"filter": {"num_workers": 32, "batch_size": 128}}),
+with flags given on the command line taking precedence.
+"""
+import argparse
+import dataclasses
+import glob
+import json
+import sys
+
+from cs336_data.uri_io import is_local
+
+
+def expand_inputs(patterns) -> list[str]:
+    """Expand local glob patterns (sorted); URIs and plain paths are kept as given."""
+    paths = []
+    for pattern in patterns:
+        if is_local(pattern) and glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise SystemExit(f"No files match {pattern}")
+            paths.extend(matches)
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def load_options(args, section: str) -> dict:
+    """Options of a subcommand: its config file section, overridden by the flags that were given."""
+    options = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            options.update(json.load(f).get(section, {}))
+    options.update({
+        name: value for name, value in vars(args).items()
+        if value is not None and name not in ("config", "command", "handler")
+    })
+    return options
+
+
+def make_config(config_class, options: dict, parser: argparse.ArgumentParser):
+    """`config_class(**options)`, reporting unknown or invalid options (e.g. from a config file) as usage errors."""
+    unknown = sorted(set(options) - {field.name for field in dataclasses.fields(config_class)})
+    if unknown:
+        parser.error(f"unknown option{'s' if len(unknown) > 1 else ''}: {', '.join(unknown)}")
+    try:
+        return config_class(**options)
+    except (TypeError, ValueError) as e:
+        parser.error(str(e))
+
+
+def run_filter_command(options: dict, parser: argparse.ArgumentParser):
+    from cs336_data.distributed import LeaseDirectory, run_worker
+    from cs336_data.fliter_mul_process import FilterConfig, run_filter
+
+    inputs = expand_inputs(options.pop("inputs", []))
+    output_dir = options.pop("output_dir")
+    num_workers = options.pop("num_workers", None)
+    lease_dir = options.pop("lease_dir", None)
+    if not inputs and lease_dir is None:
+        raise SystemExit("filter: give WARC inputs, or a --lease-dir that already lists them")
+    if "content_languages" in options and isinstance(options["content_languages"], str):
+        options["content_languages"] = tuple(options["content_languages"].split(","))
+    config = make_config(FilterConfig, options, parser)
+
+    if lease_dir is None:
+        output_files = run_filter(inputs, output_dir, num_workers=num_workers, config=config)
+        for output_file in output_files:
+            print(f"Output file written: {output_file}")
+        return
+    leases = LeaseDirectory(lease_dir)
+    if inputs:
+        leases.plan(inputs)
+    committed = run_worker(lease_dir, output_dir, num_workers=num_workers, config=config)
+    print(f"Committed {len(committed)} shards; lease directory status: {leases.status()}")
+
+
+def run_dedup_exact_command(options: dict, parser: argparse.ArgumentParser):
+    from cs336_data.exact_line_deduplication import deduplicate_parquets
+
+    output_paths, dedup_line_cnt, all_line_cnt = deduplicate_parquets(
+        expand_inputs(options["inputs"]), options["output_dir"], spill_dir=options.get("spill_dir"),
+        num_partitions=options.get("num_partitions", 256), num_workers=options.get("num_workers"),
+        reuse_line_hashes=options.get("reuse_line_hashes", True),
+        target_shard_bytes=options.get("target_shard_mb", 256) << 20,
+        hash_buffer_size=(options.get("hash_buffer_mb", 32) << 20) // 8,
+    )
+    print(f"Dedup rate: {dedup_line_cnt}/{all_line_cnt} = {dedup_line_cnt/max(all_line_cnt, 1):.2%}")
+    for output_path in output_paths:
+        print(f"Output file written: {output_path}")
+
+
+def run_dedup_fuzzy_command(options: dict, parser: argparse.ArgumentParser):
+    from cs336_data.fuzzy_deduplication import fuzzy_deduplicate_min_hash_lsh_parquet
+
+    input_paths = expand_inputs(options.pop("inputs"))
+    output_path = fuzzy_deduplicate_min_hash_lsh_parquet(parquet_paths=input_paths, **options)
+    print(f"Output file written: {output_path}")
+
+
+def run_tokenize_command(options: dict, parser: argparse.ArgumentParser):
+    from cs336_data.tokenize_data import tokenize_parquets
+
+    num_tokens = tokenize_parquets(
+        expand_inputs(options["inputs"]), options["output"],
+        tokenizer=options.get("tokenizer", "gpt2"), batch_size=options.get("batch_size", 1024),
+    )
+    print(f"Wrote {num_tokens} tokens to {options['output']}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cs336-data", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, handler, help):
+        subparser = subparsers.add_parser(name, help=help)
+        subparser.add_argument("--config", help="JSON config file with options for this command.")
+        subparser.set_defaults(handler=handler)
+        return subparser
+
+    filter_parser = add_command("filter", run_filter_command, "Filter WARC files into parquet.")
+    filter_parser.add_argument("inputs", nargs="*", help="WARC files, glob patterns or URIs (http(s)://, s3://, ...).")
+    filter_parser.add_argument("--output-dir", help="Directory for the filtered parquet files, manifests and reports.")
+    filter_parser.add_argument("--num-workers", type=int, help="Worker processes (default: all available CPUs).")
+    filter_parser.add_argument("--lease-dir", help="Shared lease directory: process shards as one of many workers.")
+    filter_parser.add_argument("--records-per-chunk", type=int, help="WARC records per scheduling unit.")
+    filter_parser.add_argument("--row-group-size", type=int, help="Rows per parquet row group.")
+    filter_parser.add_argument("--batch-size", type=int, help="Records per classifier batch.")
+    filter_parser.add_argument("--cache-size", type=int, help="In-memory result cache entries per worker.")
+    filter_parser.add_argument("--cache-path", help="SQLite result cache shared by workers and runs.")
+    filter_parser.add_argument("--max-content-length", type=int, help="Skip records with a larger WARC Content-Length.")
+    filter_parser.add_argument("--content-languages", help="Comma-separated ISO 639-3 languages to keep, e.g. eng.")
+    filter_parser.add_argument("--max-payload-bytes", type=int, help="Skip records with larger payloads (default 4 MiB).")
+    filter_parser.add_argument("--max-text-chars", type=int, help="Skip records with longer extracted text.")
+    filter_parser.add_argument("--extract-timeout", type=float,
+                               help="Time budget in seconds per record extraction (enforced in a child process).")
+    filter_parser.add_argument("--prefetch-records", type=int, help="Records read ahead per worker (0 disables).")
+    filter_parser.add_argument("--profile-interval", type=float, help="Seconds between profile.json snapshots.")
+    filter_parser.add_argument("--sample-rate", type=float, help="Only process this fraction of records, e.g. 0.01.")
+    filter_parser.add_argument("--sample-seed", type=int, help="Seed of the record sample (default 0).")
+    filter_parser.add_argument("--gopher-min-words", type=int, help="Gopher rule: fewest words (default 50).")
+    filter_parser.add_argument("--gopher-max-words", type=int, help="Gopher rule: most words (default 100000).")
+    filter_parser.add_argument("--gopher-min-mean-word-len", type=float, help="Gopher rule: shortest mean word (default 3).")
+    filter_parser.add_argument("--gopher-max-mean-word-len", type=float, help="Gopher rule: longest mean word (default 10).")
+    filter_parser.add_argument("--gopher-max-ellipsis-ratio", type=float,
+                               help="Gopher rule: largest fraction of lines ending with an ellipsis (default 0.3).")
+    filter_parser.add_argument("--gopher-min-alpha-word-ratio", type=float,
+                               help="Gopher rule: smallest fraction of words with a letter (default 0.8).")
+    filter_parser.add_argument("--language", help="Language to keep (default en).")
+    filter_parser.add_argument("--min-language-confidence", type=float,
+                               help="Reject texts identified as the language with a lower confidence (default 0).")
+    filter_parser.add_argument("--nsfw-threshold", type=float,
+                               help="Reject texts classified NSFW with at least this confidence (default 0).")
+    filter_parser.add_argument("--toxic-threshold", type=float,
+                               help="Reject texts classified toxic with at least this confidence (default 0).")
+
+    exact_parser = add_command("dedup-exact", run_dedup_exact_command, "Exact line deduplication of parquet files.")
+    exact_parser.add_argument("inputs", nargs="*", help="Parquet files or glob patterns.")
+    exact_parser.add_argument("--output-dir", help="Directory for the deduplicated_data-*.parquet shards.")
+    exact_parser.add_argument("--spill-dir", help="Count line hashes out of core, spilling them to this directory.")
+    exact_parser.add_argument("--num-partitions", type=int, help="Spill partitions, a power of two (default 256).")
+    exact_parser.add_argument("--num-workers", type=int, help="Worker processes hashing and rewriting files.")
+    exact_parser.add_argument("--rehash-lines", dest="reuse_line_hashes", action="store_false", default=None,
+                              help="Hash lines again in the rewrite pass instead of saving them (8 bytes per line).")
+    exact_parser.add_argument("--target-shard-mb", type=int, help="Size of the output shards in MiB (default 256).")
+    exact_parser.add_argument("--hash-buffer-mb", type=int,
+                              help="Line hashes buffered per worker before counting or spilling, in MiB (default 32).")
+
+    fuzzy_parser = add_command("dedup-fuzzy", run_dedup_fuzzy_command, "MinHash + LSH document deduplication.")
+    fuzzy_parser.add_argument("inputs", nargs="*", help="Parquet files or glob patterns, deduplicated together.")
+    fuzzy_parser.add_argument("--output-dir", help="Directory for deduplicated_data.parquet.")
+    fuzzy_parser.add_argument("--num-hashes", type=int, help="MinHash permutations (default 128).")
+    fuzzy_parser.add_argument("--num-bands", type=int, help="LSH bands (default 32).")
+    fuzzy_parser.add_argument("--ngram", type=int, help="Word n-gram length of the shingles (default 3).")
+    fuzzy_parser.add_argument("--threshold", type=float, help="Jaccard similarity threshold for duplicates.")
+    fuzzy_parser.add_argument("--random-seed", type=int, help="Seed for choosing the document kept per cluster.")
+
+    tokenize_parser = add_command("tokenize", run_tokenize_command, "Tokenize parquet text into a flat uint16 .bin file.")
+    tokenize_parser.add_argument("inputs", nargs="*", help="Parquet files or glob patterns.")
+    tokenize_parser.add_argument("--output", help="Output .bin file.")
+    tokenize_parser.add_argument("--tokenizer", help="Hugging Face tokenizer name or path (default gpt2).")
+    tokenize_parser.add_argument("--batch-size", type=int, help="Documents per tokenizer call.")
+    return parser
+
+
+# Options that must come from the command line or the config file, per command
+REQUIRED_OPTIONS = {
+    "filter": ["output_dir"],
+    "dedup-exact": ["inputs", "output_dir"],
+    "dedup-fuzzy": ["inputs", "output_dir"],
+    "tokenize": ["inputs", "output"],
+}
+FUZZY_DEFAULTS = {"num_hashes": 128, "num_bands": 32, "ngram": 3}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "inputs", None) == []:
+        args.inputs = None
+    options = load_options(args, args.command.replace("-", "_"))
+    missing = [name for name in REQUIRED_OPTIONS[args.command] if name not in options]
+    if missing:
+        parser.error(f"{args.command}: missing {', '.join(missing)} (give them as arguments or in --config)")
+    if args.command == "dedup-fuzzy":
+        options = {**FUZZY_DEFAULTS, **options}
+    args.handler(options, parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,48 @@
-from pathlib import Path
+import argparse
 import tempfile
+from pathlib import Path
+
 import pandas as pd
 
-from exact_line_deduplication import deduplicate_parquets
-from fuzzy_deduplication import fuzzy_deduplicate_min_hash_lsh_parquet
+from cs336_data.exact_line_deduplication import deduplicate_parquets
+from cs336_data.fuzzy_deduplication import fuzzy_deduplicate_min_hash_lsh_parquet
+
+
+def dedup_data(input_parquet_paths, output_dir, num_hashes: int = 128, num_bands: int = 32, ngram: int = 3,
+               threshold: float = 0.8, random_seed: int = 42):
+    """
+    Exact line deduplication across the filtered parquet files, then fuzzy
+    document deduplication (MinHash + LSH) of the result into `output_dir`.
+
+    Returns:
+        Path: The deduplicated parquet file.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shard_paths, dedup_line_cnt, all_line_cnt = deduplicate_parquets(input_parquet_paths, tmpdir)
+        print(f"Dedup rate: {dedup_line_cnt}/{all_line_cnt} = {dedup_line_cnt/max(all_line_cnt, 1):.2%}")
+
+        deduped_path = fuzzy_deduplicate_min_hash_lsh_parquet(
+            parquet_paths=shard_paths,
+            num_hashes=num_hashes,
+            num_bands=num_bands,
+            ngram=ngram,
+            output_dir=output_dir,
+            threshold=threshold,
+            random_seed=random_seed,
+        )
+
+    data = pd.read_parquet(deduped_path)
+    print(f"Final deduped data size: {len(data)} rows")
+    return deduped_path
 
-flitered_data_path = Path("/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/flitered_data")
-flitered_datas = flitered_data_path.glob("*.parquet")
 
-dudeped_data_path = Path("/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/deduped_data")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact line and fuzzy document deduplication of filtered data.")
+    parser.add_argument("input_dir", help="Directory with the filtered *.parquet files.")
+    parser.add_argument("output_dir", help="Directory to write deduplicated_data.parquet to.")
+    args = parser.parse_args(argv)
+    dedup_data(sorted(Path(args.input_dir).glob("*.parquet")), args.output_dir)
 
-# with tempfile.TemporaryDirectory() as tmpdir:
-#     output_path, dedup_line_cnt, all_line_cnt = deduplicate_parquets(flitered_datas, tmpdir)
-#     print(f"Dedup rate: {dedup_line_cnt}/{all_line_cnt} = {dedup_line_cnt/all_line_cnt:.2%}")
-    
-#     fuzzy_deduplicate_min_hash_lsh_parquet(
-#         parquet_path=output_path,
-#         num_hashes=128,
-#         num_bands=32,
-#         ngram=3,
-#         output_dir=dudeped_data_path,
-#     )
 
-data = pd.read_parquet("/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/deduped_data/deduplicated_data.parquet")
-print(f"Final deduped data size: {len(data)} rows")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
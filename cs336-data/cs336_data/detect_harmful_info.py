@@ -1,11 +1,6 @@
-import fasttext
+import numpy as np
 
-NSFW_MODEL_PATH = "./models/jigsaw_fasttext_bigrams_nsfw_final.bin"
-TOXIC_MODEL_PATH = "./models/jigsaw_fasttext_bigrams_hatespeech_final.bin"
-
-# Load model once
-nsfw_model = fasttext.load_model(NSFW_MODEL_PATH)
-toxic_model = fasttext.load_model(TOXIC_MODEL_PATH)
+from cs336_data.model_registry import get_model
 
 def detect_nsfw(text: str):
     """
@@ -13,7 +8,7 @@ def detect_nsfw(text: str):
     Returns:
         (label: str, confidence: float)
     """
-    labels, probs = nsfw_model.predict(text)
+    labels, probs = get_model("nsfw").predict(text)
     label = labels[0].replace("__label__", "")
     confidence = float(probs[0])
     return label, confidence
@@ -24,7 +19,31 @@ def detect_toxic_speech(text: str):
     Returns:
         (label: str, confidence: float)
     """
-    labels, probs = toxic_model.predict(text)
+    labels, probs = get_model("toxic").predict(text)
     label = labels[0].replace("__label__", "")
     confidence = float(probs[0])
-    return label, confidence
\ No newline at end of file
+    return label, confidence
+
+def _predict_batch(model, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    if not texts:
+        return np.array([], dtype=str), np.array([], dtype=np.float64)
+    labels, probs = model.predict([text.replace("\n", " ") for text in texts])
+    labels = np.array([label[0].replace("__label__", "") for label in labels])
+    confidences = np.array([prob[0] for prob in probs], dtype=np.float64)
+    return labels, confidences
+
+def detect_nsfw_batch(texts: list[str]):
+    """
+    Batched `detect_nsfw`: classify a list of texts with a single fastText call.
+    Returns:
+        (labels: np.ndarray[str], confidences: np.ndarray[float64])
+    """
+    return _predict_batch(get_model("nsfw"), texts)
+
+def detect_toxic_speech_batch(texts: list[str]):
+    """
+    Batched `detect_toxic_speech`: classify a list of texts with a single fastText call.
+    Returns:
+        (labels: np.ndarray[str], confidences: np.ndarray[float64])
+    """
+    return _predict_batch(get_model("toxic"), texts)
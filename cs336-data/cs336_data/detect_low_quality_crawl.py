@@ -1,5 +1,12 @@
 import re
-import fasttext
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from cs336_data.model_registry import get_model
+
+_WORD_PATTERN = re.compile(r"\b\w+\b")
+_ASCII_ALPHA_PATTERN = re.compile(r"[A-Za-z]")
 
 def gopher_quality_filter(text: str, 
                           min_words=50, 
@@ -10,15 +17,31 @@ def gopher_quality_filter(text: str,
                           min_alpha_word_ratio=0.8):
     """
     Apply a subset of Gopher-style quality filters to a text sample.
+
+    Words are scanned once with running counts for the word-count, word-length
+    and alphabetic-word rules, and the scan stops as soon as `max_words` is
+    exceeded, so an oversized page costs at most `max_words` words of work. In
+    that case diagnostics["num_words"] is `max_words + 1` rather than the full
+    count; every other diagnostic is unchanged.
     
     Returns:
         (bool, dict): (passes_quality_check, diagnostics)
     """
     diagnostics = {}
     
-    # Tokenize words (rough heuristic)
-    words = re.findall(r"\b\w+\b", text)
-    num_words = len(words)
+    # Tokenize words (rough heuristic), keeping running statistics
+    num_words = 0
+    num_word_chars = 0
+    alpha_words = 0
+    has_alpha = _ASCII_ALPHA_PATTERN.search
+    for match in _WORD_PATTERN.finditer(text):
+        num_words += 1
+        if num_words > max_words:
+            break
+        word = match.group()
+        num_word_chars += len(word)
+        if has_alpha(word):
+            alpha_words += 1
     diagnostics["num_words"] = num_words
     
     # 1. Word count filter
@@ -27,7 +50,7 @@ def gopher_quality_filter(text: str,
         return False, diagnostics
     
     # 2. Mean word length filter
-    mean_word_len = sum(len(w) for w in words) / num_words if num_words > 0 else 0
+    mean_word_len = num_word_chars / num_words if num_words > 0 else 0
     diagnostics["mean_word_len"] = mean_word_len
     if mean_word_len < min_mean_word_len or mean_word_len > max_mean_word_len:
         diagnostics["fail_reason"] = f"Mean word length out of range [{min_mean_word_len}, {max_mean_word_len}]"
@@ -46,7 +69,6 @@ def gopher_quality_filter(text: str,
         return False, diagnostics
     
     # 4. Alphabetic word ratio filter
-    alpha_words = sum(1 for w in words if re.search(r"[A-Za-z]", w))
     alpha_ratio = alpha_words / num_words if num_words > 0 else 0
     diagnostics["alpha_word_ratio"] = alpha_ratio
     if alpha_ratio < min_alpha_word_ratio:
@@ -57,21 +79,158 @@ def gopher_quality_filter(text: str,
     diagnostics["fail_reason"] = None
     return True, diagnostics
 
-model_path = "/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/models/low_quality_classifier_q.bin"
-model = fasttext.load_model(model_path)
+# Short names of the Gopher rules, keyed by the start of their fail_reason
+GOPHER_RULES = {
+    "Word count": "word_count",
+    "Mean word length": "mean_word_len",
+    "Too many lines ending with ellipsis": "ellipsis_ratio",
+    "Too few alphabetic words": "alpha_word_ratio",
+}
+
+def gopher_fail_rule(fail_reason: str | None) -> str | None:
+    """The short name of the rule behind a gopher_quality_filter fail_reason (None if it passed)."""
+    if fail_reason is None:
+        return None
+    for prefix, rule in GOPHER_RULES.items():
+        if fail_reason.startswith(prefix):
+            return rule
+    return "other"
+
+# RE2 equivalents of the patterns above, for pyarrow's string kernels. RE2's \w and \b are
+# ASCII-only, while Python's \w is Unicode letters, numbers and underscore; a maximal run
+# of those is exactly a \b\w+\b match.
+_WORD_CHAR = r"[\pL\pN_]"
+_WORD = _WORD_CHAR + "+"
+_ALPHA_WORD = _WORD_CHAR + "*[A-Za-z]" + _WORD_CHAR + "*"
+# Line boundaries of str.splitlines(), normalised to "\n" before counting lines
+_LINE_BREAK = r"\r\n|[\r\x0b\x0c\x1c\x1d\x1e\x85\x{2028}\x{2029}]"
+# Whitespace removed by str.strip() that can occur inside a line
+_INLINE_SPACE = r"[\t\x1f \pZ]"
+_NON_BLANK_LINE = r"(?m)^" + _INLINE_SPACE + r"*[^\t\x1f\n \pZ][^\n]*$"
+_ELLIPSIS_LINE_END = r"(?m)\.\.\." + _INLINE_SPACE + "*$"
+
+def gopher_quality_filter_batch(texts,
+                                min_words=50,
+                                max_words=100_000,
+                                min_mean_word_len=3,
+                                max_mean_word_len=10,
+                                max_ellipsis_ratio=0.3,
+                                min_alpha_word_ratio=0.8) -> tuple[np.ndarray, pa.Table]:
+    """
+    Vectorized `gopher_quality_filter` over many texts at once.
+
+    Word, word-character, alphabetic-word and line counts come from pyarrow's
+    regex string kernels, and the thresholds are applied with NumPy, so there
+    is no per-document Python loop except to format the fail reasons.
+
+    The kernels scan whole texts, so texts long enough to hold more than
+    `max_words` words (at least 2 * max_words characters, as words are
+    separated by at least one character) go through the bounded scan of
+    `gopher_quality_filter` instead, one at a time.
+
+    Args:
+        texts: list of str (or a pyarrow string array); None is treated as "".
+
+    Returns:
+        (np.ndarray, pa.Table): (passes_quality_check mask, diagnostics) where the
+        diagnostics table has one row per text with columns num_words, mean_word_len,
+        ellipsis_ratio, alpha_word_ratio and fail_reason (null if the text passes).
+        All metrics are computed for every text, even past its first failing rule,
+        except for long texts, which have the diagnostics of `gopher_quality_filter`
+        (num_words is capped at max_words + 1, and metrics past the failing rule are NaN).
+    """
+    if not isinstance(texts, (pa.Array, pa.ChunkedArray)):
+        texts = pa.array(texts, type=pa.string())
+    texts = pc.fill_null(texts, "")
+    # Character length, not bytes: a word is at least one character
+    long_texts = pc.greater_equal(pc.utf8_length(texts), 2 * max_words)
+    long_indices = np.flatnonzero(long_texts.to_numpy(zero_copy_only=False))
+    if len(long_indices):
+        long_results = [
+            gopher_quality_filter(texts[int(i)].as_py(), min_words, max_words, min_mean_word_len,
+                                  max_mean_word_len, max_ellipsis_ratio, min_alpha_word_ratio)
+            for i in long_indices
+        ]
+        texts = pc.if_else(long_texts, "", texts)
+
+    num_words = pc.count_substring_regex(texts, _WORD).to_numpy()
+    num_word_chars = pc.count_substring_regex(texts, _WORD_CHAR).to_numpy()
+    num_alpha_words = pc.count_substring_regex(texts, _ALPHA_WORD).to_numpy()
+    lines = pc.replace_substring_regex(texts, _LINE_BREAK, "\n")
+    num_lines = pc.count_substring_regex(lines, _NON_BLANK_LINE).to_numpy()
+    num_ellipsis_lines = pc.count_substring_regex(lines, _ELLIPSIS_LINE_END).to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_word_len = np.where(num_words > 0, num_word_chars / num_words, 0.0)
+        alpha_ratio = np.where(num_words > 0, num_alpha_words / num_words, 0.0)
+        ellipsis_ratio = np.where(num_lines > 0, num_ellipsis_lines / num_lines, 0.0)
+
+    # Rules are checked in the same order as gopher_quality_filter; a text fails on its first broken rule
+    word_count_fail = (num_words < min_words) | (num_words > max_words)
+    word_len_fail = ~word_count_fail & ((mean_word_len < min_mean_word_len) | (mean_word_len > max_mean_word_len))
+    ellipsis_fail = ~word_count_fail & ~word_len_fail & (ellipsis_ratio > max_ellipsis_ratio)
+    alpha_fail = ~word_count_fail & ~word_len_fail & ~ellipsis_fail & (alpha_ratio < min_alpha_word_ratio)
+    passed = ~(word_count_fail | word_len_fail | ellipsis_fail | alpha_fail)
+
+    fail_reason = [None] * len(passed)
+    for i in np.flatnonzero(word_count_fail):
+        fail_reason[i] = f"Word count out of range [{min_words}, {max_words}]"
+    for i in np.flatnonzero(word_len_fail):
+        fail_reason[i] = f"Mean word length out of range [{min_mean_word_len}, {max_mean_word_len}]"
+    for i in np.flatnonzero(ellipsis_fail):
+        fail_reason[i] = f"Too many lines ending with ellipsis ({ellipsis_ratio[i]:.2%})"
+    for i in np.flatnonzero(alpha_fail):
+        fail_reason[i] = f"Too few alphabetic words ({alpha_ratio[i]:.2%})"
+
+    num_words = num_words.astype(np.int64)
+    if len(long_indices):
+        for i, (long_passed, long_diagnostics) in zip(long_indices, long_results):
+            passed[i] = long_passed
+            fail_reason[i] = long_diagnostics["fail_reason"]
+            num_words[i] = long_diagnostics["num_words"]
+            mean_word_len[i] = long_diagnostics.get("mean_word_len", np.nan)
+            ellipsis_ratio[i] = long_diagnostics.get("ellipsis_ratio", np.nan)
+            alpha_ratio[i] = long_diagnostics.get("alpha_word_ratio", np.nan)
+
+    diagnostics = pa.table({
+        "num_words": num_words,
+        "mean_word_len": mean_word_len,
+        "ellipsis_ratio": ellipsis_ratio,
+        "alpha_word_ratio": alpha_ratio,
+        "fail_reason": pa.array(fail_reason, type=pa.string()),
+    })
+    return passed, diagnostics
+
 def fasttext_quality_classify(text: str) -> tuple[str, float]:
     """
     Classify text quality using a FastText model.
     
     Args:
         text (str): The input text to classify.
-        model: The loaded FastText model.
         
     Returns:
         (str, float): (predicted_label, confidence_score)
     """
     text = text.replace("\n", " ").replace("\r", " ").strip()
-    labels, probabilities = model.predict(text)
+    labels, probabilities = get_model("quality").predict(text)
     predicted_label = labels[0].replace("__label__", "")
     confidence_score = probabilities[0]
-    return predicted_label, confidence_score
\ No newline at end of file
+    return predicted_label, confidence_score
+
+def fasttext_quality_classify_batch(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Classify the quality of many texts with a single FastText call.
+
+    Args:
+        texts (list[str]): The input texts to classify.
+
+    Returns:
+        (np.ndarray, np.ndarray): (predicted_labels, confidence_scores)
+    """
+    if not texts:
+        return np.array([], dtype=str), np.array([], dtype=np.float64)
+    texts = [text.replace("\n", " ").replace("\r", " ").strip() for text in texts]
+    labels, probabilities = get_model("quality").predict(texts)
+    predicted_labels = np.array([label[0].replace("__label__", "") for label in labels])
+    confidence_scores = np.array([prob[0] for prob in probabilities], dtype=np.float64)
+    return predicted_labels, confidence_scores
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from cs336_data.manifest import write_json_atomic
+from cs336_data.uri_io import is_local, local_path
+
+
+def shard_id(uri) -> str:
+    """
+    Name of a shard in the lease directory and the output directory: its file
+    stem and a short hash of the normalized URI, so that shards with the same
+    file name in different directories (a/00001.warc.gz, b/00001.warc.gz) do
+    not collide. Relative paths are not made absolute, as workers on different
+    nodes may run from different directories.
+    """
+    uri = os.path.normpath(local_path(uri)) if is_local(uri) else str(uri)
+    digest = hashlib.blake2b(uri.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{Path(uri).stem}-{digest}"
+
+
+class Lease:
+    """
+    Exclusive claim on one shard, kept alive by a heartbeat thread that touches
+    the lease file every `heartbeat_seconds`. Use as a context manager; `lost`
+    is set if the lease expired and was taken over by another worker.
+    """
+    def __init__(self, leases: "LeaseDirectory", shard: str):
+        self.leases = leases
+        self.shard = shard
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def heartbeat(self) -> bool:
+        """Refresh the lease; returns False (and sets `lost`) if it is no longer ours."""
+        if not self.leases.owns(self.shard):
+            self.lost.set()
+            return False
+        os.utime(self.leases.lease_path(self.shard))
+        return True
+
+    def _beat(self):
+        while not self._stop.wait(self.leases.heartbeat_seconds):
+            try:
+                if not self.heartbeat():
+                    return
+            except FileNotFoundError:
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._beat, name=f"lease-{self.shard}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        if exc_type is not None:
+            self.leases.release(self.shard)
+
+
+class LeaseDirectory:
+    """
+    Shard leases on a filesystem shared by all nodes (e.g. NFS), so any number
+    of workers can split a list of shards without a coordinator process.
+
+    Layout of `path`:
+        shards.json: the shard URIs, written once by `plan`.
+        <shard>.lease: held by one worker; created with O_EXCL, holding the
+            owner's id, and its mtime is the owner's last heartbeat.
+        <shard>.done: written when the shard's outputs have been committed.
+
+    A lease whose mtime is older than `lease_seconds` belongs to a dead or stuck
+    worker and is taken over: it is renamed to a name unique to the new owner
+    (only one rename of the same file can succeed), checked to still be
+    expired, and replaced by a fresh lease.
+    """
+    def __init__(self, path, lease_seconds: float = 300.0, heartbeat_seconds: float | None = None,
+                 owner: str | None = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 4
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def lease_path(self, shard: str) -> Path:
+        return self.path / f"{shard}.lease"
+
+    def done_path(self, shard: str) -> Path:
+        return self.path / f"{shard}.done"
+
+    def plan(self, uris):
+        """Record the shards to process (the coordinator's only job)."""
+        write_json_atomic(self.path / "shards.json", [str(uri) for uri in uris])
+
+    def shards(self) -> list[str]:
+        with open(self.path / "shards.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    def is_done(self, shard: str) -> bool:
+        return self.done_path(shard).exists()
+
+    def owns(self, shard: str) -> bool:
+        try:
+            return self.lease_path(shard).read_text(encoding="utf-8") == self.owner
+        except FileNotFoundError:
+            return False
+
+    def _create(self, shard: str) -> bool:
+        try:
+            fd = os.open(self.lease_path(shard), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.owner)
+        return True
+
+    def _expired(self, path: Path) -> bool:
+        return time.time() - path.stat().st_mtime > self.lease_seconds
+
+    def acquire(self, shard: str) -> Lease | None:
+        """Lease `shard` if it is not done and not validly leased by another worker."""
+        if self.is_done(shard):
+            return None
+        if not self._create(shard):
+            lease_path = self.lease_path(shard)
+            stale_path = self.path / f"{shard}.lease.stale-{self.owner}"
+            try:
+                if not self._expired(lease_path):
+                    return None
+                os.rename(lease_path, stale_path)
+            except FileNotFoundError:
+                # Released or taken over by someone else in the meantime
+                return None
+            if not self._expired(stale_path):
+                # A fresh lease replaced the expired one after we looked at it: put it back
+                try:
+                    os.link(stale_path, lease_path)
+                except FileExistsError:
+                    pass
+                os.remove(stale_path)
+                return None
+            os.remove(stale_path)
+            if not self._create(shard):
+                return None
+        if self.is_done(shard):
+            # Finished by the previous owner just before its lease was taken over
+            self.release(shard)
+            return None
+        return Lease(self, shard)
+
+    def release(self, shard: str):
+        if self.owns(shard):
+            os.remove(self.lease_path(shard))
+
+    def commit(self, shard: str, info: dict | None = None) -> bool:
+        """Mark `shard` done if we still hold its lease; returns whether it was committed."""
+        if not self.owns(shard):
+            return False
+        write_json_atomic(self.done_path(shard), {"owner": self.owner, "time": time.time(), **(info or {})})
+        os.remove(self.lease_path(shard))
+        return True
+
+    def status(self) -> dict:
+        """Number of "done", "leased" and "pending" shards."""
+        counts = {"done": 0, "leased": 0, "pending": 0}
+        for uri in self.shards():
+            shard = shard_id(uri)
+            if self.is_done(shard):
+                counts["done"] += 1
+            elif self.lease_path(shard).exists():
+                counts["leased"] += 1
+            else:
+                counts["pending"] += 1
+        return counts
+
+
+def filter_shard(uri, staging_dir, num_workers=None, config=None) -> list[Path]:
+    """Run the filter pipeline on one shard into `staging_dir`; returns the files to commit."""
+    # Imported here so that lease handling does not pull in the models' dependencies
+    from cs336_data.fliter_mul_process import run_filter
+
+    shard, stem = shard_id(uri), Path(str(uri)).stem
+    run_filter([uri], staging_dir, num_workers=num_workers, config=config)
+    staging_dir = Path(staging_dir)
+    outputs = []
+    for suffix in (".parquet", ".stats.json", ".profile.json"):
+        source = staging_dir / ("profile.json" if suffix == ".profile.json" else f"{stem}{suffix}")
+        outputs.append(staging_dir / f"{shard}{suffix}")
+        os.replace(source, outputs[-1])
+    return outputs
+
+
+def run_worker(lease_dir, output_directory_path, process_shard=None, poll_seconds: float = 10.0,
+               lease_seconds: float = 300.0, **process_kwargs) -> list[str]:
+    """
+    Process shards from a lease directory until every shard is done.
+
+    Each leased shard is processed into a staging directory private to this
+    worker, and its files are moved into `output_directory_path` (os.replace,
+    so readers never see partial files) only if the lease is still ours, which
+    is checked again right before every move and the commit, while the lease
+    is still being heartbeated; a worker whose lease expired and was taken
+    over discards its results. When
+    all remaining shards are leased by others, the worker polls every
+    `poll_seconds` to pick up leases that expire.
+
+    Args:
+        lease_dir: Shared lease directory, planned with `LeaseDirectory.plan`.
+        output_directory_path: Shared output directory.
+        process_shard: Callable (uri, staging_dir, **process_kwargs) -> list of
+            output paths; defaults to `filter_shard`.
+        **process_kwargs: Passed to `process_shard`, e.g. num_workers or config.
+
+    Returns:
+        list[str]: The shards this worker committed.
+    """
+    process_shard = process_shard or filter_shard
+    leases = LeaseDirectory(lease_dir, lease_seconds=lease_seconds)
+    output_directory = Path(output_directory_path)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    staging_root = output_directory / ".staging" / leases.owner
+    committed = []
+    while True:
+        remaining = [uri for uri in leases.shards() if not leases.is_done(shard_id(uri))]
+        if not remaining:
+            break
+        progressed = False
+        for uri in remaining:
+            shard = shard_id(uri)
+            lease = leases.acquire(shard)
+            if lease is None:
+                continue
+            progressed = True
+            staging_dir = staging_root / shard
+            with lease:
+                outputs = [Path(output) for output in process_shard(uri, staging_dir, **process_kwargs)]
+                held = True
+                for output in outputs:
+                    held = not lease.lost.is_set() and leases.owns(shard)
+                    if not held:
+                        break
+                    os.replace(output, output_directory / output.name)
+                # commit checks the lease itself, right before writing the done marker
+                if held and leases.commit(shard, {"outputs": [output.name for output in outputs]}):
+                    committed.append(shard)
+                else:
+                    print(f"Lost the lease on {shard}, discarding its outputs")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        if not progressed:
+            time.sleep(poll_seconds)
+    shutil.rmtree(staging_root, ignore_errors=True)
+    try:
+        # Only succeeds once the last worker is done with it
+        staging_root.parent.rmdir()
+    except OSError:
+        pass
+    return committed
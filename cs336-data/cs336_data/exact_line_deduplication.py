@@ -1,82 +1,322 @@
-import hashlib
-from collections import Counter
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import tempfile
+from itertools import islice
 from pathlib import Path
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def deduplicate_files(input_file_paths, output_file_path):
+from cs336_data.line_hashes import (
+    MERGE_BUFFER_SIZE, DuplicateHashSet, HashSpiller, LineHashCounter, count_partitions, hash_lines,
+)
+from cs336_data.parquet_io import ShardedParquetWriter
+
+# Default size of the deduplicated parquet shards
+TARGET_SHARD_BYTES = 256 << 20
+
+# Lines of a text file hashed at a time
+LINE_BLOCK_SIZE = 1 << 16
+
+
+def _line_blocks(f, block_size: int = LINE_BLOCK_SIZE):
+    """The lines of an open text file, `block_size` at a time."""
+    while block := list(islice(f, block_size)):
+        yield block
+
+
+def _process_pool(num_workers: int | None = None, duplicates: DuplicateHashSet | None = None, spill_dir=None,
+                  num_partitions: int = 256, buffer_size: int = MERGE_BUFFER_SIZE):
+    """
+    A process pool for per-file dedup jobs. `duplicates` is handed to every
+    worker once when it starts (shared copy-on-write where processes fork)
+    rather than pickled into every job. With `spill_dir`, every worker gets
+    one `HashSpiller` in its own subdirectory, shared by all files it counts,
+    so there are at most `num_workers * num_partitions` spill files.
+    """
+    mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=mp_context, initializer=_init_worker,
+        initargs=(duplicates, spill_dir, num_partitions, buffer_size),
+    )
+
+
+# Set in each worker by `_process_pool`: the duplicate line hashes of the
+# running rewrite pass, and the worker's spiller when counting out of core
+_duplicates = None
+_spiller = None
+
+
+def _init_worker(duplicates: DuplicateHashSet | None, spill_dir, num_partitions: int, buffer_size: int):
+    global _duplicates, _spiller
+    _duplicates = duplicates
+    _spiller = None
+    if spill_dir is not None:
+        _spiller = HashSpiller(Path(spill_dir) / f"worker-{os.getpid()}", num_partitions, buffer_size)
+
+
+def _count_text_file(path) -> LineHashCounter:
+    counter = LineHashCounter()
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for lines in _line_blocks(f):
+            counter.add(hash_lines(line.rstrip("\n") for line in lines))
+    return counter
+
+
+def _rewrite_text_file(path, output_path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as fin, \
+        open(output_path, "w", encoding="utf-8") as fout:
+        for lines in _line_blocks(fin):
+            is_duplicate = _duplicates.contains(hash_lines(line.rstrip("\n") for line in lines))
+            fout.writelines(line for line, duplicate in zip(lines, is_duplicate) if not duplicate)
+
+
+def deduplicate_files(input_file_paths, output_file_path, num_workers: int | None = None):
     """
     Perform exact line deduplication across multiple files.
     
     Args:
         input_file_paths (list[str]): List of paths to input files.
+        output_file_path: Directory to write the deduplicated files to, under their names.
+        num_workers (int | None): Processes hashing and rewriting files (default: all CPUs).
 
     This function:
-    1. Computes a hash for each line across all files and counts frequency.
-    2. Rewrites each file keeping only lines that are unique globally.
+    1. Computes a 64-bit hash for each line across all files and counts frequency
+       (see `LineHashCounter`), one file per worker, merging the partial counts.
+    2. Rewrites each file keeping only lines that are unique globally, one file per worker.
     """
 
-    def line_hash(line: str) -> str:
-        """Return a short, stable hash for the line to save memory."""
-        return hashlib.sha1(line.encode("utf-8", errors="ignore")).hexdigest()
-
     # --- Step 1: Count line hashes across all files ---
-    freq = Counter()
-    for path in input_file_paths:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                h = line_hash(line.rstrip("\n"))
-                freq[h] += 1
+    freq = LineHashCounter()
+    with _process_pool(num_workers) as executor:
+        for partial in executor.map(_count_text_file, input_file_paths):
+            freq.merge(partial)
 
     # --- Step 2: Rewrite each file with unique lines only ---
-    for path in input_file_paths:
-        with open(path, "r", encoding="utf-8", errors="ignore") as fin, \
-            open(output_file_path / path.name, "w", encoding="utf-8") as fout:
-            for line in fin:
-                h = line_hash(line.rstrip("\n"))
-                if freq[h] == 1:
-                    fout.write(line)
-
-def deduplicate_parquets(input_parquet_paths, output_parquet_path):
-    deduped_line_cnt = 0
-    all_line_cnt = 0
+    output_paths = [Path(output_file_path) / Path(path).name for path in input_file_paths]
+    with _process_pool(num_workers, freq.duplicates()) as executor:
+        list(executor.map(_rewrite_text_file, input_file_paths, output_paths))
 
-    def line_hash(line: str) -> str:
-        """Return a short, stable hash for the line to save memory."""
-        return hashlib.sha1(line.encode("utf-8", errors="ignore")).hexdigest()
 
-    # --- Step 1: Count line hashes across all files ---
-    freq = Counter()
-    paths = []
-    for path in input_parquet_paths:
-        paths.append(path)
-        print(f"Reading {path} for line frequency counting...")
-        df = pd.read_parquet(path)
-        for text in df['text']:
-            for line in text.splitlines():
-                h = line_hash(line.rstrip("\n"))
-                freq[h] += 1
-                all_line_cnt += 1
+def _hash_documents(texts):
+    """(hashes of all lines in document order, offsets: document i's lines are hashes[offsets[i]:offsets[i + 1]])."""
+    doc_lines = [text.splitlines() for text in texts]
+    offsets = np.zeros(len(doc_lines) + 1, dtype=np.int64)
+    np.cumsum([len(lines) for lines in doc_lines], out=offsets[1:])
+    return hash_lines(line for lines in doc_lines for line in lines), offsets
 
-    # --- Step 2: Rewrite each file with unique lines only ---
-    output_data = []
-    for path in paths:
-        df = pd.read_parquet(path)
-        for row in df.itertuples():
-            text = row.text
-            lang = row.language
-            url = row.url
-            new_texts = []
-            for line in text.splitlines():
-                h = line_hash(line.rstrip("\n"))
-                if freq[h] == 1:
-                    new_texts.append(line)
+
+def line_hash_paths(hash_dir, index: int) -> tuple[Path, Path]:
+    """
+    The sidecar files with the line hashes (raw little-endian uint64) and the
+    document offsets (raw little-endian int64, one more than documents) of
+    input file `index`.
+    """
+    return Path(hash_dir) / f"file-{index:05d}.hashes.u64", Path(hash_dir) / f"file-{index:05d}.offsets.i64"
+
+
+def _count_parquet(path, hash_paths=None, buffer_size: int = MERGE_BUFFER_SIZE):
+    """
+    Hash the lines of a parquet file's texts, one row group at a time: into a
+    `LineHashCounter` buffering `buffer_size` hashes, or into this worker's
+    spiller if the pool spills (see `_process_pool`), which is flushed at the
+    end. With `hash_paths` (see `line_hash_paths`), the hashes and document
+    offsets are also saved for the rewrite pass.
+
+    Returns:
+        (counter or None, number of lines)
+    """
+    counter = LineHashCounter(buffer_size) if _spiller is None else _spiller
+    line_cnt = 0
+    with contextlib.ExitStack() as stack:
+        if hash_paths is not None:
+            # Appended one batch at a time, so a file's hashes are never all held in memory
+            hashes_file = stack.enter_context(open(hash_paths[0], "wb"))
+            offsets_file = stack.enter_context(open(hash_paths[1], "wb"))
+            np.zeros(1, dtype="<i8").tofile(offsets_file)
+        for batch in pq.ParquetFile(path).iter_batches(columns=['text']):
+            hashes, offsets = _hash_documents(batch.column('text').to_pylist())
+            counter.add(hashes)
+            if hash_paths is not None:
+                hashes.astype("<u8", copy=False).tofile(hashes_file)
+                (offsets[1:] + line_cnt).astype("<i8", copy=False).tofile(offsets_file)
+            line_cnt += len(hashes)
+    if _spiller is None:
+        return counter, line_cnt
+    _spiller.flush()
+    return None, line_cnt
+
+
+def _rewrite_groups(paths, target_shard_bytes: int = TARGET_SHARD_BYTES) -> list[list[int]]:
+    """
+    Split the inputs into runs of consecutive files written to the same shards:
+    a run takes files until they add up to `target_shard_bytes` on disk, so
+    small inputs share shards instead of each getting a tiny one, and only
+    holds files with the same schema (including metadata). Files without rows
+    are left out.
+    """
+    groups, group_bytes, group_schema = [], 0, None
+    for i, path in enumerate(paths):
+        metadata = pq.read_metadata(path)
+        if metadata.num_rows == 0:
+            continue
+        size, schema = os.path.getsize(path), metadata.schema.to_arrow_schema()
+        if not groups or group_bytes + size > target_shard_bytes or not schema.equals(group_schema, check_metadata=True):
+            groups.append([])
+            group_bytes, group_schema = 0, schema
+        groups[-1].append(i)
+        group_bytes += size
+    return groups
+
+
+def _rewrite_parquets(paths, output_prefix, hash_paths, target_shard_bytes: int = TARGET_SHARD_BYTES):
+    """
+    Stream the row groups of `paths` (files with the same schema), in order and
+    without duplicate lines, into parquet shards `<output_prefix>-NNNNN.parquet`,
+    keeping every column. Line hashes are memory-mapped from each file's
+    `hash_paths` entry if not None, and computed otherwise. Empty row groups
+    are skipped, so inputs without rows produce no shard.
+
+    Returns:
+        (shard paths, rows written, lines removed)
+    """
+    deduped_line_cnt = 0
+    schema = pq.read_schema(paths[0])
+    text_index = schema.get_field_index('text')
+    text_field = schema.field(text_index)
+    with ShardedParquetWriter(output_prefix, schema, target_bytes=target_shard_bytes) as writer:
+        for path, file_hash_paths in zip(paths, hash_paths):
+            parquet_file = pq.ParquetFile(path)
+            if file_hash_paths is not None:
+                file_offsets = np.memmap(file_hash_paths[1], dtype="<i8", mode="r")
+                # np.memmap cannot map an empty file
+                file_hashes = (np.memmap(file_hash_paths[0], dtype="<u8", mode="r") if file_offsets[-1]
+                               else np.empty(0, "<u8"))
+            doc_cnt = 0
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                if table.num_rows == 0:
+                    continue
+                texts = table.column('text').to_pylist()
+                if file_hash_paths is None:
+                    hashes, offsets = _hash_documents(texts)
                 else:
-                    deduped_line_cnt += 1
-            new_text = "\n".join(new_texts)
-            output_data.append((url, lang, new_text))
-    output_df = pd.DataFrame(output_data, columns=['url', 'language', 'text'])
-    output_path = Path(output_parquet_path) / "deduplicated_data.parquet"
-    output_df.to_parquet(output_path, index=False)
-    print(f"Deduped Size: {len(output_data)} rows")
-    return output_path, deduped_line_cnt, all_line_cnt
-            
\ No newline at end of file
+                    offsets = file_offsets[doc_cnt:doc_cnt + len(texts) + 1]
+                    hashes = file_hashes[offsets[0]:offsets[-1]]
+                    offsets = np.asarray(offsets - offsets[0])
+                is_duplicate = _duplicates.contains(hashes)
+                new_texts = []
+                for text, start, end in zip(texts, offsets[:-1], offsets[1:]):
+                    lines = text.splitlines()
+                    kept_lines = [line for line, duplicate in zip(lines, is_duplicate[start:end]) if not duplicate]
+                    deduped_line_cnt += len(lines) - len(kept_lines)
+                    new_texts.append("\n".join(kept_lines))
+                table = table.set_column(text_index, text_field, pa.array(new_texts, type=text_field.type))
+                writer.write_table(table)
+                doc_cnt += len(texts)
+    return writer.paths, writer.num_rows, deduped_line_cnt
+
+
+def deduplicate_parquets(input_parquet_paths, output_parquet_path, spill_dir=None, num_partitions: int = 256,
+                         num_workers: int | None = None, reuse_line_hashes: bool = True,
+                         target_shard_bytes: int = TARGET_SHARD_BYTES, hash_buffer_size: int = MERGE_BUFFER_SIZE):
+    """
+    Exact line deduplication of the `text` column of parquet files: lines that
+    occur more than once across all documents are removed.
+
+    Both passes run one input file per worker process and read it one row
+    group at a time. By default every worker counts its file's line hashes in
+    memory (see `LineHashCounter`) and the partial counts are merged as they
+    complete, each dropped once merged. With `spill_dir`, workers instead
+    spill their hashes to `num_partitions` files by hash prefix, one set of
+    files per worker process in a temporary directory under `spill_dir` (see
+    `HashSpiller`), the partitions are counted in parallel, and the rewrite
+    looks lines up in the memory-mapped set of duplicate hashes, so memory no
+    longer grows with the number of distinct lines.
+
+    With `reuse_line_hashes`, the first pass appends every file's line hashes
+    (8 bytes per line) and per-document offsets batch by batch to raw files
+    next to the spill files (see `line_hash_paths`), and the rewrite memory-maps them
+    instead of hashing every line again; it still reads the texts to rewrite
+    them.
+
+    The rewrite streams the inputs' row groups, with all their columns and
+    schema metadata, into shards `deduplicated_data-<group>-<shard>.parquet`
+    of about `target_shard_bytes`, so memory stays flat and later stages can
+    work on the shards in parallel. Consecutive small inputs with the same
+    schema are grouped into the same shards (see `_rewrite_groups`), one group
+    per rewrite job, and inputs without rows produce no shard.
+
+    Args:
+        input_parquet_paths: Parquet files with a text column.
+        output_parquet_path: Directory to write the deduplicated shards to.
+        spill_dir: Directory (ideally on a local disk) for the spill files; they
+            take 8 bytes per line and are deleted when done.
+        num_partitions (int): Spill partitions, a power of two; each counting
+            worker holds one partition in memory at a time.
+        num_workers (int | None): Worker processes (default: all CPUs).
+        reuse_line_hashes (bool): Keep the first pass's line hashes for the
+            rewrite instead of hashing twice.
+        target_shard_bytes (int): Size at which an output shard is closed.
+        hash_buffer_size (int): Line hashes (8 bytes each) a worker buffers
+            before merging them into its counter or spilling them.
+
+    Returns:
+        (list of output shards in input order, deduplicated line count, total line count)
+    """
+    paths = list(input_parquet_paths)
+    Path(output_parquet_path).mkdir(parents=True, exist_ok=True)
+    if spill_dir is not None:
+        Path(spill_dir).mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=spill_dir or output_parquet_path, prefix="dedup-") as work_dir:
+        work_dir = Path(work_dir)
+        hash_paths = [None] * len(paths)
+        if reuse_line_hashes:
+            (work_dir / "hashes").mkdir()
+            hash_paths = [line_hash_paths(work_dir / "hashes", i) for i in range(len(paths))]
+        # --- Step 1: Count line hashes across all files ---
+        freq = LineHashCounter()
+        all_line_cnt = 0
+        spill_root = None if spill_dir is None else work_dir / "spill"
+        with _process_pool(num_workers, None, spill_root, num_partitions, hash_buffer_size) as executor:
+            futures = {
+                executor.submit(_count_parquet, path, hash_paths[i], hash_buffer_size): path
+                for i, path in enumerate(paths)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                partial, line_cnt = future.result()
+                print(f"Counted {line_cnt} lines of {futures.pop(future)}")
+                if partial is not None:
+                    freq.merge(partial)
+                # Drop the partial counts (also held by the future) as soon as they are merged
+                del partial, future
+                all_line_cnt += line_cnt
+        if spill_dir is None:
+            print(f"Counted {len(freq)} distinct lines in {freq.nbytes / 2**20:.1f} MiB")
+            duplicates = freq.duplicates()
+        else:
+            duplicates = count_partitions(spill_root, num_partitions, num_workers)
+        print(f"Found {len(duplicates)} duplicated lines")
+
+        # --- Step 2: Rewrite each file with unique lines only ---
+        groups = _rewrite_groups(paths, target_shard_bytes)
+        output_paths = []
+        row_cnt = deduped_line_cnt = 0
+        with _process_pool(num_workers, duplicates) as executor:
+            results = executor.map(
+                _rewrite_parquets,
+                [[paths[i] for i in group] for group in groups],
+                [Path(output_parquet_path) / f"deduplicated_data-{g:05d}" for g in range(len(groups))],
+                [[hash_paths[i] for i in group] for group in groups],
+                [target_shard_bytes] * len(groups),
+            )
+            for shard_paths, rows, deduped_lines in results:
+                output_paths.extend(shard_paths)
+                row_cnt += rows
+                deduped_line_cnt += deduped_lines
+        del duplicates
+    print(f"Deduped Size: {row_cnt} rows in {len(output_paths)} shards")
+    return output_paths, deduped_line_cnt, all_line_cnt
@@ -1,41 +1,197 @@
+import codecs
+import multiprocessing
+import re
+
 import requests
 
 from resiliparse.extract.html2text import extract_plain_text
 from resiliparse.parse.encoding import detect_encoding
+from resiliparse.parse.html import HTMLTree
+
+# Bytes looked at for a <meta charset> declaration (the HTML spec's prescan limit)
+META_PRESCAN_BYTES = 1024
+# Bytes fed to the encoding detector when no charset is declared
+DETECT_PREFIX_BYTES = 16384
+
+_CHARSET_PATTERN = re.compile(rb"""charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE)
 
-def extract_text_from_html_bytes(html_bytes: bytes) -> str:
+
+def declared_charset(content_type: str | None, html_prefix: bytes = b"") -> str | None:
     """
-    Extracts plain text from a raw HTML byte string using Resiliparse.
+    The charset declared by an HTTP Content-Type header or, failing that, by a
+    <meta charset> / <meta http-equiv="Content-Type"> tag in `html_prefix`.
+    """
+    for source in (content_type.encode("latin-1", errors="ignore") if content_type else b"", html_prefix):
+        match = _CHARSET_PATTERN.search(source)
+        if match:
+            return match.group(1).decode("ascii")
+    return None
+
+
+def guess_encoding(html_bytes: bytes, content_type: str | None = None) -> str:
+    """
+    Best guess of the encoding of an HTML payload, looking at as few bytes as possible.
 
     Steps:
-      1. Try decoding the bytes as UTF-8 first.
-      2. If UTF-8 decoding fails, detect the encoding using resiliparse.parse.encoding.detect_encoding().
-      3. Decode again using the detected encoding.
-      4. Use resiliparse.extract.html2text.extract_plain_text() to get clean text.
+      1. The charset of the HTTP Content-Type header or of a meta tag in the first
+         META_PRESCAN_BYTES bytes, if any.
+      2. UTF-8 if the first DETECT_PREFIX_BYTES bytes are valid UTF-8, allowing a
+         multi-byte sequence cut off at the end (detectors often call mostly-ASCII
+         UTF-8 windows-1252 or similar, but UTF-8 is far more common on the web).
+      3. Otherwise resiliparse.parse.encoding.detect_encoding() on those bytes.
+    """
+    charset = declared_charset(content_type, html_bytes[:META_PRESCAN_BYTES])
+    if charset:
+        return charset
+    prefix = html_bytes[:DETECT_PREFIX_BYTES]
+    if prefix.isascii():
+        return "utf-8"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return detect_encoding(prefix)
+
+
+class ExtractionSkipped(Exception):
+    """Raised when a page is given up on; `reason` is "timeout", "text_size" or "crash"."""
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+def _extract_text(html_bytes: bytes, content_type: str | None = None, max_text_chars: int | None = None) -> str:
+    if not html_bytes:
+        return ""
+    tree = HTMLTree.parse_from_bytes(html_bytes, guess_encoding(html_bytes, content_type), errors="replace")
+    text = extract_plain_text(tree).strip()
+    if max_text_chars is not None and len(text) > max_text_chars:
+        raise ExtractionSkipped("text_size", f"extracted {len(text)} characters, limit is {max_text_chars}")
+    return text
+
+
+def _extraction_loop(conn):
+    """Body of an `ExtractionProcess`: extract every page sent over `conn` and send back the outcome."""
+    conn.send(("ready",))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("ok", _extract_text(*request)))
+        except ExtractionSkipped as e:
+            conn.send(("skipped", e.reason, str(e)))
+        except Exception as e:
+            conn.send(("error", e))
+
+
+class ExtractionProcess:
+    """
+    Extraction in a child process, so that a time budget can be enforced:
+    parsing and extraction run in resiliparse's C code, which no signal or
+    thread in this process can interrupt. A page that runs over its budget
+    gets the child killed; the next page starts a new one.
+
+    The child is started with forkserver (spawn where that is unavailable),
+    not fork, since the calling worker may have reader threads running.
+    Each page is sent to it and its text sent back over a pipe.
+    """
+    def __init__(self):
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_extraction_loop, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        # Wait for the child's imports outside of any page's budget
+        self._conn.recv()
+
+    def extract(self, html_bytes: bytes, content_type: str | None = None, max_text_chars: int | None = None,
+                timeout: float | None = None) -> str:
+        if self._process is None or not self._process.is_alive():
+            self.close()
+            self._start()
+        self._conn.send((html_bytes, content_type, max_text_chars))
+        if not self._conn.poll(timeout):
+            self.close()
+            raise ExtractionSkipped("timeout", f"extraction took longer than {timeout}s")
+        try:
+            outcome = self._conn.recv()
+        except EOFError:
+            self.close()
+            raise ExtractionSkipped("crash", "the extraction process died") from None
+        if outcome[0] == "skipped":
+            raise ExtractionSkipped(outcome[1], outcome[2])
+        if outcome[0] == "error":
+            raise outcome[1]
+        return outcome[1]
+
+    def close(self):
+        """Kill the child process, if any."""
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+
+_extraction_process = None
+
+
+def extract_text_with_limits(html_bytes: bytes, content_type: str | None = None,
+                             max_text_chars: int | None = None, timeout: float | None = None) -> str:
+    """
+    `extract_text_from_html_bytes` with a bound on time and output size, so one
+    pathological page cannot stall a worker.
 
     Args:
         html_bytes (bytes): Raw HTML byte string.
+        content_type (str | None): The HTTP Content-Type header of the response, if known.
+        max_text_chars (int | None): Give up on pages whose text is longer than this.
+        timeout (float | None): Time budget in seconds for parsing and extraction.
+            If set, pages are extracted in this process's `ExtractionProcess`,
+            which is killed when a page runs over it; this costs a round trip
+            over a pipe per page.
 
     Returns:
         str: Extracted plain text.
+
+    Raises:
+        ExtractionSkipped: If a limit is exceeded.
     """
-    if not html_bytes:
-        return ""
+    global _extraction_process
+    if not timeout or not html_bytes:
+        return _extract_text(html_bytes, content_type, max_text_chars)
+    if _extraction_process is None:
+        _extraction_process = ExtractionProcess()
+    return _extraction_process.extract(html_bytes, content_type, max_text_chars, timeout)
 
-    # Step 1: Try UTF-8 decoding
-    try:
-        html_str = html_bytes.decode('utf-8')
-    except UnicodeDecodeError:
-        # Step 2: Detect encoding if UTF-8 fails
-        enc = detect_encoding(html_bytes)
-        # Fallback if detection fails or returns None
-        # encoding = enc.encoding if enc and enc.encoding else 'latin-1'
-        html_str = html_bytes.decode(enc, errors='replace')
 
-    # Step 3: Extract plain text
-    text = extract_plain_text(html_str)
+def extract_text_from_html_bytes(html_bytes: bytes, content_type: str | None = None) -> str:
+    """
+    Extracts plain text from a raw HTML byte string using Resiliparse.
+
+    Steps:
+      1. Guess the encoding from the HTTP Content-Type, a meta charset tag or a
+         bounded prefix of the payload (see `guess_encoding`).
+      2. Decode and parse in one go with HTMLTree.parse_from_bytes(), which falls
+         back to UTF-8 / windows-1252 if the guess turns out to be wrong.
+      3. Use resiliparse.extract.html2text.extract_plain_text() to get clean text.
+
+    Args:
+        html_bytes (bytes): Raw HTML byte string.
+        content_type (str | None): The HTTP Content-Type header of the response, if known.
 
-    return text.strip()
+    Returns:
+        str: Extracted plain text.
+    """
+    return extract_text_with_limits(html_bytes, content_type)
 
 if __name__ == "__main__":
     url = "https://hit-scir-la.github.io/"
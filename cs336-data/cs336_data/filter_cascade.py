@@ -0,0 +1,170 @@
+import time
+import numpy as np
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from cs336_data.result_cache import ResultCache, content_hash
+
+
+@dataclass
+class FilterStage:
+    """
+    One filter in a cascade.
+
+    Attributes:
+        name: Stage name, used as the key of its result and in statistics.
+        predicate: Callable taking the text and returning (keep: bool, info).
+        cost: Declared relative cost of one call, used for ordering until
+            enough calls have been observed to use the measured latency.
+        batch_predicate: Optional callable taking a list of texts and returning
+            (keep: np.ndarray[bool], infos: list), used by `FilterCascade.run_batch`.
+        cache_key: Namespace of the stage's results in a `ResultCache` (default:
+            its name); should change whenever the stage's thresholds do.
+    """
+    name: str
+    predicate: Callable[[str], tuple[bool, Any]]
+    cost: float = 1.0
+    batch_predicate: Callable[[list[str]], tuple[np.ndarray, list]] | None = None
+    cache_key: str | None = None
+    calls: int = 0
+    rejections: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rejection_rate(self) -> float:
+        # Laplace smoothing so unseen stages are neither ignored nor preferred
+        return (self.rejections + 1) / (self.calls + 2)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+    def __call__(self, text: str) -> tuple[bool, Any]:
+        keep, infos = self.run_batch([text])
+        return bool(keep[0]), infos[0]
+
+    def run_batch(self, texts: list[str]) -> tuple[np.ndarray, list]:
+        start = time.perf_counter()
+        if self.batch_predicate is not None:
+            keep, infos = self.batch_predicate(texts)
+            keep = np.asarray(keep, dtype=bool)
+        else:
+            results = [self.predicate(text) for text in texts]
+            keep = np.array([result[0] for result in results], dtype=bool)
+            infos = [result[1] for result in results]
+        self.seconds += time.perf_counter() - start
+        self.calls += len(texts)
+        self.rejections += int((~keep).sum())
+        return keep, infos
+
+
+class FilterCascade:
+    """
+    Run filter stages cheapest-first and stop at the first rejection.
+
+    Stages start out ordered by declared cost. If `retune_every` is set, the
+    order is recomputed every `retune_every` documents from observed statistics:
+    for independent filters the expected cost per document is minimised by
+    sorting on cost / rejection rate, where cost is the measured mean latency
+    once every stage has seen `min_calls` documents.
+    """
+    def __init__(self, stages: list[FilterStage], retune_every: int | None = 1000, min_calls: int = 100):
+        self.stages = sorted(stages, key=lambda stage: stage.cost)
+        self.retune_every = retune_every
+        self.min_calls = min_calls
+        self.num_documents = 0
+
+    def retune(self):
+        """Reorder stages by expected cost per rejection."""
+        # Declared costs and measured latencies are in different units, so only
+        # switch to latencies once every stage has enough observations.
+        measured = all(stage.calls >= self.min_calls for stage in self.stages)
+        self.stages.sort(
+            key=lambda stage: (stage.mean_latency if measured else stage.cost) / stage.rejection_rate
+        )
+
+    def __call__(self, text: str) -> tuple[bool, str | None, dict]:
+        """
+        Returns:
+            (passed, rejected_by, infos): whether every stage kept the text, the name
+            of the rejecting stage (or None) and the info of every stage that ran.
+        """
+        passed, rejected_by, infos = self.run_batch([text])
+        return bool(passed[0]), rejected_by[0], infos[0]
+
+    def run_batch(self, texts: list[str], cache: ResultCache | None = None,
+                  profiler=None) -> tuple[np.ndarray, list, list[dict]]:
+        """
+        Filter a batch of texts stage by stage, only passing the survivors of one
+        stage on to the next. Stages with a `batch_predicate` see all survivors in
+        a single call. With a `cache`, each stage's (keep, info) is looked up by
+        the stage name and a hash of the text first, and only misses are run.
+        With a `profiler` (a `PipelineProfiler`), each stage is profiled under its name.
+
+        Returns:
+            (passed, rejected_by, infos): per-text results as in `__call__`.
+        """
+        if self.retune_every:
+            before = self.num_documents // self.retune_every
+            after = (self.num_documents + len(texts)) // self.retune_every
+            if after > before:
+                self.retune()
+        self.num_documents += len(texts)
+
+        passed = np.ones(len(texts), dtype=bool)
+        rejected_by = [None] * len(texts)
+        infos = [{} for _ in texts]
+        alive = np.arange(len(texts))
+        digests = [content_hash(text) for text in texts] if cache is not None else None
+        for stage in self.stages:
+            if len(alive) == 0:
+                break
+            with profiler.stage(stage.name) if profiler is not None else nullcontext() as profile:
+                if cache is None:
+                    keep, stage_infos = stage.run_batch([texts[i] for i in alive])
+                else:
+                    keep, stage_infos = self._run_cached(stage, texts, digests, alive, cache)
+            if profile is not None:
+                profile.records_in += len(alive)
+                profile.records_out += int(keep.sum())
+                profile.bytes_in += sum(len(texts[i]) for i in alive)
+                profile.bytes_out += sum(len(texts[i]) for i in alive[keep])
+            for i, info in zip(alive, stage_infos):
+                infos[i][stage.name] = info
+            for i in alive[~keep]:
+                passed[i] = False
+                rejected_by[i] = stage.name
+            alive = alive[keep]
+        return passed, rejected_by, infos
+
+    @staticmethod
+    def _run_cached(stage: FilterStage, texts, digests, alive, cache: ResultCache):
+        keep = np.zeros(len(alive), dtype=bool)
+        stage_infos = [None] * len(alive)
+        missing = []
+        namespace = stage.cache_key or stage.name
+        for j, i in enumerate(alive):
+            result = cache.get(namespace, digests[i])
+            if result is ResultCache.MISSING:
+                missing.append(j)
+            else:
+                keep[j], stage_infos[j] = result
+        if missing:
+            missing_keep, missing_infos = stage.run_batch([texts[alive[j]] for j in missing])
+            for j, k, info in zip(missing, missing_keep, missing_infos):
+                keep[j], stage_infos[j] = k, info
+                cache.put(namespace, digests[alive[j]], (bool(k), info))
+        return keep, stage_infos
+
+    def stats(self) -> dict:
+        """Per-stage call, rejection and latency statistics in the current order."""
+        return {
+            stage.name: {
+                "calls": stage.calls,
+                "rejections": stage.rejections,
+                "seconds": stage.seconds,
+                "cost": stage.cost,
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,95 @@
+from collections import Counter
+
+import numpy as np
+
+from cs336_data.detect_low_quality_crawl import gopher_fail_rule
+
+# Edges of the confidence histograms: ten bins of width 0.1 over [0, 1]
+CONFIDENCE_BINS = np.linspace(0.0, 1.0, 11)
+
+
+class FilterStats:
+    """
+    Why records were dropped, and what the classifiers saw.
+
+    Counts, per shard or merged over a whole run:
+        records: WARC records read.
+        skipped: records dropped before the cascade (on headers or extraction
+            limits), per reason.
+        documents / kept: documents run through the cascade / kept by it.
+        rejected_by: rejections per cascade stage.
+        gopher_rules: Gopher rejections per rule (see `gopher_fail_rule`).
+        languages: documents per identified language, over all documents the
+            language stage saw.
+        confidence: histogram of each classifier's confidence over the documents
+            it saw, in the bins of CONFIDENCE_BINS.
+
+    Stages are recognised by their info: a dict with "fail_reason" is a Gopher
+    result and a (label, confidence) pair a classifier result.
+    """
+    def __init__(self):
+        self.records = 0
+        self.skipped = Counter()
+        self.documents = 0
+        self.kept = 0
+        self.rejected_by = Counter()
+        self.gopher_rules = Counter()
+        self.languages = Counter()
+        self.confidence = {}
+
+    def skip(self, reason: str):
+        self.skipped[reason] += 1
+
+    def add_batch(self, passed, rejected_by, infos):
+        """Tally the output of `FilterCascade.run_batch`."""
+        self.documents += len(passed)
+        self.kept += int(np.count_nonzero(passed))
+        self.rejected_by.update(stage for stage in rejected_by if stage is not None)
+        confidences = {}
+        for info in infos:
+            for stage, stage_info in info.items():
+                if isinstance(stage_info, dict) and "fail_reason" in stage_info:
+                    rule = gopher_fail_rule(stage_info["fail_reason"])
+                    if rule is not None:
+                        self.gopher_rules[rule] += 1
+                elif isinstance(stage_info, (tuple, list)) and len(stage_info) == 2:
+                    label, confidence = stage_info
+                    confidences.setdefault(stage, []).append(confidence)
+                    if stage == "language":
+                        self.languages[label] += 1
+        for stage, values in confidences.items():
+            counts, _ = np.histogram(np.clip(values, 0.0, 1.0), bins=CONFIDENCE_BINS)
+            self.confidence[stage] = (self.confidence.get(stage, 0) + counts).tolist()
+
+    def merge(self, other):
+        """Add the counts of another FilterStats, or of its `to_dict()`."""
+        if isinstance(other, FilterStats):
+            other = other.to_dict()
+        self.records += other["records"]
+        self.skipped.update(other["skipped"])
+        self.documents += other["documents"]
+        self.kept += other["kept"]
+        self.rejected_by.update(other["rejected_by"])
+        self.gopher_rules.update(other["gopher_rules"])
+        self.languages.update(other["languages"])
+        for stage, counts in other["confidence"].items():
+            self.confidence[stage] = (np.asarray(self.confidence.get(stage, 0)) + counts).tolist()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FilterStats":
+        stats = cls()
+        stats.merge(data)
+        return stats
+
+    def to_dict(self) -> dict:
+        return {
+            "records": self.records,
+            "skipped": dict(self.skipped),
+            "documents": self.documents,
+            "kept": self.kept,
+            "rejected_by": dict(self.rejected_by),
+            "gopher_rules": dict(self.gopher_rules),
+            "languages": dict(self.languages.most_common()),
+            "confidence_bins": CONFIDENCE_BINS.round(2).tolist(),
+            "confidence": dict(self.confidence),
+        }
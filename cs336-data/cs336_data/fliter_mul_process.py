@@ -1,77 +1,588 @@
-import concurrent.futures 
-import os
+import concurrent.futures
+import functools
 import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
 from tqdm import tqdm
-from pprint import pprint
 from pathlib import Path
-from warcio.archiveiterator import ArchiveIterator
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cs336_data.extract_from_html import ExtractionSkipped, extract_text_with_limits
+from cs336_data.identify_language import identify_language, identify_language_batch
+from cs336_data.remove_personal_info import PIIMasker
+from cs336_data.detect_harmful_info import detect_nsfw, detect_toxic_speech, detect_nsfw_batch, detect_toxic_speech_batch
+from cs336_data.detect_low_quality_crawl import gopher_quality_filter, gopher_quality_filter_batch
+from cs336_data.filter_cascade import FilterCascade, FilterStage
+from cs336_data.filter_stats import FilterStats
+from cs336_data.manifest import ShardManifest, write_json_atomic
+from cs336_data.model_registry import preload_models
+from cs336_data.parquet_io import StreamingParquetWriter, with_sample_rate
+from cs336_data.profiling import PipelineProfiler
+from cs336_data.result_cache import ResultCache, content_hash
+from cs336_data.warc_reader import index_warc_chunks, prefetch, read_record_payloads
+
+OUTPUT_SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("language", pa.string()),
+    ("text", pa.string()),
+])
+
+
+@dataclass
+class FilterConfig:
+    """
+    Tuning knobs of the WARC filtering pipeline.
+
+    Attributes:
+        records_per_chunk: WARC records per scheduling unit.
+        row_group_size: Rows per parquet row group (bounds output buffering per worker).
+        batch_size: Records buffered per worker before the filters run on them.
+        cache_size: In-memory result cache entries per worker (0 disables it).
+        cache_path: Optional SQLite result cache shared by workers and runs.
+        max_content_length: Skip records with a larger WARC Content-Length.
+        content_languages: Skip records whose identified content languages
+            (ISO 639-3, e.g. ("eng",)) include none of these.
+        max_payload_bytes: Skip records whose payload is larger (only this many
+            bytes plus one are read). Common Crawl truncates payloads at 1 MiB,
+            so the default only drops pages from other crawls that would take
+            long to parse.
+        max_text_chars: Skip records whose extracted text is longer.
+        extract_timeout: Time budget in seconds for extracting one record. Pages
+            are then extracted in a child process of the worker that is killed
+            at the deadline (see `ExtractionProcess`).
+        prefetch_records: Records read, decompressed and pre-filtered ahead by a
+            background thread of each worker (0 reads on the worker's thread).
+        profile_interval: If set, `run_filter` rewrites its profile.json at most
+            this often (in seconds) while running, not only at the end.
+        sample_rate: If set, only process this fraction of the records of every
+            shard, drawn deterministically from their URLs (see `in_sample`), e.g.
+            0.01 to tune thresholds on 1% of the data. Outputs and statistics
+            are tagged with it.
+        sample_seed: Draws a different sample of the same rate.
+        gopher_min_words, gopher_max_words, gopher_min_mean_word_len,
+        gopher_max_mean_word_len, gopher_max_ellipsis_ratio,
+        gopher_min_alpha_word_ratio: Limits of the Gopher rules (see
+            `gopher_quality_filter`).
+        language: Language to keep, as identified by the language stage.
+        min_language_confidence: Reject texts identified as `language` with a
+            lower confidence.
+        nsfw_threshold: Reject texts classified NSFW with at least this confidence.
+        toxic_threshold: Reject texts classified toxic with at least this confidence.
+    """
+    records_per_chunk: int = 1000
+    row_group_size: int = 1000
+    batch_size: int = 64
+    cache_size: int = 0
+    cache_path: str | None = None
+    max_content_length: int | None = None
+    content_languages: tuple[str, ...] | None = None
+    max_payload_bytes: int | None = 4 << 20
+    max_text_chars: int | None = None
+    extract_timeout: float | None = None
+    prefetch_records: int = 256
+    profile_interval: float | None = None
+    sample_rate: float | None = None
+    sample_seed: int = 0
+    gopher_min_words: int = 50
+    gopher_max_words: int = 100_000
+    gopher_min_mean_word_len: float = 3
+    gopher_max_mean_word_len: float = 10
+    gopher_max_ellipsis_ratio: float = 0.3
+    gopher_min_alpha_word_ratio: float = 0.8
+    language: str = "en"
+    min_language_confidence: float = 0.0
+    nsfw_threshold: float = 0.0
+    toxic_threshold: float = 0.0
+
+    def __post_init__(self):
+        if self.sample_rate is not None and not 0.0 < self.sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be in (0, 1], got {self.sample_rate}")
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on (respects taskset / cgroup affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def gopher_stage(text: str, **limits):
+    return gopher_quality_filter(text, **limits)
+
+
+def gopher_batch_stage(texts: list[str], **limits):
+    passed, diagnostics = gopher_quality_filter_batch(texts, **limits)
+    return passed, diagnostics.to_pylist()
+
+
+def language_stage(text: str, language: str = "en", min_confidence: float = 0.0):
+    lang, confidence = identify_language(text)
+    return lang == language and confidence >= min_confidence, (lang, confidence)
+
+
+def language_batch_stage(texts: list[str], language: str = "en", min_confidence: float = 0.0):
+    langs, confidences = identify_language_batch(texts)
+    return (langs == language) & (confidences >= min_confidence), list(zip(langs.tolist(), confidences.tolist()))
+
+
+def nsfw_stage(text: str, threshold: float = 0.0):
+    label, confidence = detect_nsfw(text)
+    return label != "nsfw" or confidence < threshold, (label, confidence)
+
+
+def nsfw_batch_stage(texts: list[str], threshold: float = 0.0):
+    labels, confidences = detect_nsfw_batch(texts)
+    return (labels != "nsfw") | (confidences < threshold), list(zip(labels.tolist(), confidences.tolist()))
+
+
+def toxic_stage(text: str, threshold: float = 0.0):
+    label, confidence = detect_toxic_speech(text)
+    return label != "toxic" or confidence < threshold, (label, confidence)
+
+
+def toxic_batch_stage(texts: list[str], threshold: float = 0.0):
+    labels, confidences = detect_toxic_speech_batch(texts)
+    return (labels != "toxic") | (confidences < threshold), list(zip(labels.tolist(), confidences.tolist()))
+
+
+# Models used by `default_cascade`
+DEFAULT_CASCADE_MODELS = ["language", "nsfw", "toxic"]
+
+
+def stage_options(config: FilterConfig | None = None) -> dict[str, dict]:
+    """The keyword arguments of each `default_cascade` stage under the thresholds of `config`."""
+    config = config or FilterConfig()
+    return {
+        "gopher": {
+            "min_words": config.gopher_min_words,
+            "max_words": config.gopher_max_words,
+            "min_mean_word_len": config.gopher_min_mean_word_len,
+            "max_mean_word_len": config.gopher_max_mean_word_len,
+            "max_ellipsis_ratio": config.gopher_max_ellipsis_ratio,
+            "min_alpha_word_ratio": config.gopher_min_alpha_word_ratio,
+        },
+        "language": {"language": config.language, "min_confidence": config.min_language_confidence},
+        "nsfw": {"threshold": config.nsfw_threshold},
+        "toxic": {"threshold": config.toxic_threshold},
+    }
+
+
+def default_cascade(config: FilterConfig | None = None) -> FilterCascade:
+    """
+    Gopher rules first (vectorized, rejects most of Common Crawl), then the
+    fastText classifiers, with the thresholds of `config`. Cached stage results
+    are keyed by the thresholds too, so a shared cache is not reused across
+    different settings.
+    """
+    options = stage_options(config)
+    predicates = {
+        "gopher": (gopher_stage, gopher_batch_stage, 1.0),
+        "language": (language_stage, language_batch_stage, 10.0),
+        "nsfw": (nsfw_stage, nsfw_batch_stage, 10.0),
+        "toxic": (toxic_stage, toxic_batch_stage, 10.0),
+    }
+    return FilterCascade([
+        FilterStage(
+            name, functools.partial(predicate, **options[name]), cost=cost,
+            batch_predicate=functools.partial(batch_predicate, **options[name]),
+            cache_key=f"{name}:{json.dumps(options[name], sort_keys=True)}",
+        )
+        for name, (predicate, batch_predicate, cost) in predicates.items()
+    ])
+
+
+_worker_cascades = {}
+
+
+def worker_cascade(config: FilterConfig | None = None) -> FilterCascade:
+    """
+    The default cascade of this process for the thresholds of `config`, kept
+    across chunks so its auto-tuning carries over.
+    """
+    key = json.dumps(stage_options(config), sort_keys=True)
+    if key not in _worker_cascades:
+        _worker_cascades[key] = default_cascade(config)
+    return _worker_cascades[key]
+
+
+_worker_caches = {}
+
+
+def worker_cache(cache_size: int = 0, cache_path=None) -> ResultCache | None:
+    """
+    This process's result cache for the given configuration, or None if caching is off.
+    The in-memory tier holds `cache_size` entries; `cache_path` adds a shared SQLite tier.
+    """
+    if not cache_size and cache_path is None:
+        return None
+    key = (cache_size, str(cache_path) if cache_path is not None else None)
+    if key not in _worker_caches:
+        _worker_caches[key] = ResultCache(max_entries=cache_size, db_path=cache_path)
+    return _worker_caches[key]
+
+
+def extract_text(payload: bytes, content_type: str | None = None, cache: ResultCache | None = None,
+                 config: FilterConfig | None = None) -> str:
+    """
+    `extract_text_with_limits` with the limits of `config`, looked up by payload
+    hash first if a cache is given. Pages that exceed a limit are not cached.
+
+    Raises:
+        ExtractionSkipped: If a limit is exceeded.
+    """
+    config = config or FilterConfig()
+
+    def extract():
+        return extract_text_with_limits(payload, content_type, config.max_text_chars, config.extract_timeout)
+
+    if cache is None:
+        return extract()
+    key = content_hash(payload, content_type or "")
+    text = cache.get("extract", key)
+    if text is ResultCache.MISSING:
+        text = extract()
+        cache.put("extract", key, text)
+    return text
 
-from extract_from_html import extract_text_from_html_bytes
-from identify_language import identify_language
-from remove_personal_info import mask_emails, mask_phone_numbers, mask_ip_addresses
-from detect_harmful_info import detect_nsfw, detect_toxic_speech
-from detect_low_quality_crawl import gopher_quality_filter, fasttext_quality_classify
 
-def process_single_warc_file(input_path: str, output_path: str):  
-    # TODO: read input path, process the input, and write the output to output_path 
+pii_masker = PIIMasker()
+
+
+def mask_pii(text: str) -> str:
+    masked_text, _ = pii_masker.mask(text)
+    return masked_text
+
+
+def filter_records(records, cascade: FilterCascade, cache: ResultCache | None = None,
+                   config: FilterConfig | None = None, stats: FilterStats | None = None,
+                   profiler: PipelineProfiler | None = None):
+    """
+    Run extraction, the filter cascade and PII masking on a batch of records.
+
+    Args:
+        records: list of (url, payload, content_type) tuples, content_type being
+            the HTTP Content-Type header (its charset is used to decode the payload).
+        cascade: The filters to apply; classifier stages see the whole batch at once.
+        cache: Optional cache of extraction results (by payload hash) and stage
+            results (by text hash), so repeated payloads skip extract-and-classify.
+        config: Extraction limits (see `FilterConfig`).
+        stats: Filtering statistics to update: records whose extraction exceeded
+            a limit are counted as skipped (and logged by URL), the others by the
+            stage that rejected them.
+        profiler: Profiler for the "extract", cascade and "pii" stages.
+
+    Returns:
+        list of (url, language, masked_text) for the records that are kept.
+    """
+    profiler = profiler or PipelineProfiler()
+    extracted = []
+    with profiler.stage("extract") as profile:
+        for record in records:
+            url, payload, content_type = record
+            try:
+                extracted.append((record, extract_text(payload, content_type, cache, config)))
+            except ExtractionSkipped as e:
+                print(f"Skipped url: {url} ({e})")
+                if stats is not None:
+                    stats.skip(e.reason)
+        profile.records_in += len(records)
+        profile.records_out += len(extracted)
+        profile.bytes_in += sum(len(payload) for _, payload, _ in records)
+        profile.bytes_out += sum(len(text) for _, text in extracted)
+    records = [record for record, _ in extracted]
+    texts = [text for _, text in extracted]
+    flat_texts = [text.replace("\n", " ").replace("\r", " ").strip() for text in texts]
+    passed, rejected_by, infos = cascade.run_batch(flat_texts, cache=cache, profiler=profiler)
+    if stats is not None:
+        stats.add_batch(passed, rejected_by, infos)
     outputs = []
+    with profiler.stage("pii") as profile:
+        for (url, *_), text, keep, info in zip(records, texts, passed, infos):
+            if not keep:
+                # print(f"Filtered url: {url} by {rejected_by}: {info}")
+                continue
+            lang = info["language"][0] if "language" in info else None
+            outputs.append((url, lang, mask_pii(text)))
+            profile.bytes_in += len(text)
+            profile.bytes_out += len(outputs[-1][2])
+        profile.records_in += len(outputs)
+        profile.records_out += len(outputs)
+    return outputs
+
+
+def process_warc_chunk(input_path, output_path, start_offset: int = 0, end_offset: int | None = None,
+                       cascade: FilterCascade | None = None, config: FilterConfig | None = None):
+    """
+    Filter the records of `input_path` in [start_offset, end_offset) and stream the
+    surviving documents to `output_path` as parquet, `config.row_group_size` rows at a time.
+
+    Records are read and decompressed by a background thread (see
+    `read_record_payloads` and `prefetch`), which skips records their headers
+    rule out without reading their payload. Records over the payload, text or
+    time limits of `config` are skipped too. The rest are filtered with `cascade`
+    (this process's default cascade if None), `config.batch_size` records at a time
+    so classifiers run batched, with results cached as configured (see `worker_cache`).
+
+    Returns:
+        (output_path, stats) where stats has the number of "records" read, the number
+        of "rows" written, the "skipped" record count per skip reason, the
+        "filter" statistics (see `FilterStats`) and the per-stage "profile"
+        (see `PipelineProfiler`).
+    """
+    config = config or FilterConfig()
+    cascade = cascade or worker_cascade(config)
+    cache = worker_cache(config.cache_size, config.cache_path)
+    profiler = PipelineProfiler()
+    filter_stats = FilterStats()
     cnt = 0
-    with open(input_path, 'rb') as stream:
-        for record in ArchiveIterator(stream):
+    batch = []
+
+    def write_rows(rows):
+        with profiler.stage("write") as profile:
+            for row in rows:
+                writer.write(row)
+                profile.bytes_in += len(row[2])
+            profile.records_in += len(rows)
+            profile.records_out += len(rows)
+
+    schema = with_sample_rate(OUTPUT_SCHEMA, config.sample_rate)
+    with StreamingParquetWriter(output_path, schema, row_group_size=config.row_group_size) as writer:
+        records = read_record_payloads(
+            input_path, start_offset, end_offset,
+            config.max_content_length, config.content_languages, config.max_payload_bytes,
+            config.sample_rate, config.sample_seed,
+        )
+        read_profile = profiler.stats("warc_read")
+        profiler.note(
+            "warc_read",
+            "Records are read and decompressed by a prefetch thread: wall_seconds is mostly time spent "
+            "waiting on its queue, and cpu_seconds excludes the thread's own work.",
+        )
+        for record in profiler.iterate("warc_read", prefetch(records, config.prefetch_records)):
             cnt = cnt + 1
-            if record.rec_type == 'response':
-                url = record.rec_headers.get_header('WARC-Target-URI')
-                payload = record.content_stream().read()
-
-                data = extract_text_from_html_bytes(payload)
-                flat_data = data.replace("\n", " ").replace("\r", " ").strip()
-                quality, _ = gopher_quality_filter(flat_data)
-                # qlabel, _ = fasttext_quality_classify(flat_data)
-                lang, _ = identify_language(flat_data)
-                nsfw, _ = detect_nsfw(flat_data)
-                toxic, _ = detect_toxic_speech(flat_data)
-                if lang != "en" or nsfw == "nsfw" or toxic == "toxic" or quality == False:
-                    # print(f"Filtered url: {url}, lang: {lang}, nsfw: {nsfw}, toxic: {toxic}, quality: {quality}, qlabel: {qlabel}")
-                    continue
-                masked_data, _ = mask_emails(data)
-                masked_data, _ = mask_phone_numbers(masked_data)
-                masked_data, _ = mask_ip_addresses(masked_data)
-
-                outputs.append((url, lang, masked_data))
+            if record.skip_reason is not None:
+                if record.skip_reason == "payload_size":
+                    print(f"Skipped url: {record.url} (payload larger than {config.max_payload_bytes} bytes)")
+                filter_stats.skip(record.skip_reason)
+            else:
+                read_profile.records_out += 1
+                read_profile.bytes_in += len(record.payload)
+                read_profile.bytes_out += len(record.payload)
+                batch.append((record.url, record.payload, record.content_type))
+                if len(batch) >= config.batch_size:
+                    write_rows(filter_records(batch, cascade, cache, config, filter_stats, profiler))
+                    batch = []
             if cnt % 1000 == 0:
-                print(f"Processed {cnt} records from {input_path}, get {len(outputs)} valid samples.")
-
-    df = pd.DataFrame(outputs, columns=["url", "language", "text"])
-    df.to_parquet(output_path, index=False)
-    return output_path 
- 
-# Set up the executor  
-num_cpus = 10 # len(os.sched_getaffinity(0)) 
-executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_cpus) 
-
-warc_filebase = Path("/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/data")
-warc_filepaths = list(warc_filebase.glob("CC-MAIN-*.warc.gz"))
-output_directory_path = "/data/home/hyzheng/Projects/CS336/assignment4-data/cs336-data/flitered_data"  
-
-futures = [] 
-
-pprint(warc_filepaths)
-for warc_filepath in warc_filepaths:  
-    # For each WARC filepath, submit a job to the executor and get a future back 
-    output_path = os.path.join(output_directory_path, Path(warc_filepath).stem + ".parquet")
-    print(output_path)
-    future = executor.submit( 
-        process_single_warc_file, 
-        warc_filepath, 
-        output_path,
-    ) 
-    
-    # Store the futures  
-    futures.append(future)  
-    
-# Iterate over the completed futures as they finish, using a progress bar 
-# to keep track of progress. 
-for future in tqdm( concurrent.futures.as_completed(futures), total=len(warc_filepaths), ): 
-    output_file = future.result() 
-print(f"Output file written: {output_file}")
\ No newline at end of file
+                print(f"Processed {cnt} records from {input_path}@{start_offset}, get {writer.num_rows} valid samples.")
+        write_rows(filter_records(batch, cascade, cache, config, filter_stats, profiler))
+        with profiler.stage("write"):
+            writer.flush()
+    profiler.stats("write").bytes_out += os.path.getsize(output_path)
+    if cache is not None:
+        cache.flush()
+    filter_stats.records = cnt
+    stats = {
+        "records": cnt,
+        "rows": writer.num_rows,
+        "skipped": dict(filter_stats.skipped),
+        "filter": filter_stats.to_dict(),
+        "profile": profiler.to_dict(),
+    }
+    return output_path, stats
+
+
+def process_single_warc_file(input_path: str, output_path: str, cascade: FilterCascade | None = None,
+                             config: FilterConfig | None = None):
+    output_path, _ = process_warc_chunk(input_path, output_path, cascade=cascade, config=config)
+    return output_path
+
+
+def merge_parquet_parts(part_paths, output_path, row_group_size: int = 1000, schema: pa.Schema = OUTPUT_SCHEMA):
+    """Concatenate chunk outputs (in order) into a single parquet file, one row group at a time."""
+    with StreamingParquetWriter(output_path, schema, row_group_size=row_group_size) as writer:
+        for part_path in part_paths:
+            part = pq.ParquetFile(part_path)
+            for i in range(part.num_row_groups):
+                writer.write_table(part.read_row_group(i))
+    return output_path
+
+
+def shard_stats_path(output_path) -> str:
+    """Where the filtering statistics of the shard written to `output_path` go."""
+    return str(output_path).removesuffix(".parquet") + ".stats.json"
+
+
+def run_filter(warc_filepaths, output_directory_path, num_workers: int | None = None,
+               cascade: FilterCascade | None = None, config: FilterConfig | None = None):
+    """
+    Filter many WARC files with record-level scheduling.
+
+    Every WARC is first indexed into chunks of `config.records_per_chunk` records, then
+    all chunks of all files are fed to a single process pool, so a few large
+    shards no longer leave most workers idle at the tail. When every chunk of a
+    shard is done, its parts are merged into `<output_dir>/<warc stem>.parquet`.
+    Outputs are streamed `config.row_group_size` rows at a time, so worker memory
+    does not grow with shard size.
+
+    Progress is checkpointed in `<output_dir>/<warc stem>.manifest.json` after
+    every chunk. Rerunning with the same output directory skips finished shards
+    and only processes the chunks of partial shards that were not committed.
+
+    Records are filtered by `cascade`. If None, every worker process uses its
+    own `default_cascade` with the thresholds of `config`, whose stage order is
+    tuned as it goes; an explicit
+    cascade is copied into each chunk job. Workers skip records that headers
+    already rule out (non-HTML, non-200, oversized, ...), buffer
+    `config.batch_size` records and run each classifier once per batch.
+
+    Byte-identical payloads can be served from a cache instead of being
+    extracted and classified again: `config.cache_size` entries per worker in
+    memory, plus an optional SQLite file at `config.cache_path` shared by all
+    workers and runs.
+
+    With the default cascade its models are loaded once in this process before
+    the pool forks, so all workers share them copy-on-write.
+
+    Filtering statistics (see `FilterStats`) are written next to each output as
+    `<warc stem>.stats.json` and summed over all shards into
+    `<output_dir>/stats.json`.
+
+    With `config.sample_rate`, only a deterministic sample of the records of
+    every shard is processed (the rest are counted as skipped "not_sampled").
+    The rate is recorded in the parquet schema metadata of the outputs (see
+    `parquet_sample_rate`) and as "sample_rate" in the statistics files, so
+    counts can be scaled to the full data; it is 1.0 for full runs.
+
+    The per-stage profiles of all chunks processed by this run are summed into
+    `<output_dir>/profile.json`, written at the end and, with
+    `config.profile_interval`, periodically while running.
+
+    Returns:
+        list[str]: The merged output files.
+    """
+    config = config or FilterConfig()
+    num_workers = num_workers or available_cpus()
+    profiler = PipelineProfiler()
+    run_stats = FilterStats()
+    profile_path = os.path.join(output_directory_path, "profile.json")
+    run_start = time.perf_counter()
+    last_snapshot = run_start
+
+    def write_profile():
+        profiler.write_json(
+            profile_path, elapsed_seconds=time.perf_counter() - run_start, num_workers=num_workers,
+            shards_done=len(output_files), shards_total=len(warc_filepaths),
+        )
+
+    os.makedirs(output_directory_path, exist_ok=True)
+    if cascade is None:
+        preload_models(DEFAULT_CASCADE_MODELS)
+    mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+
+    output_files = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context) as executor:
+        pending = {}
+        manifests = {}
+
+        def submit_chunks(warc_filepath):
+            manifest = manifests[warc_filepath]
+            for i in manifest.pending_chunks():
+                chunk = manifest.chunks[i]
+                future = executor.submit(
+                    process_warc_chunk, warc_filepath, chunk["part"], chunk["start"], chunk["end"], cascade, config
+                )
+                pending[future] = ("chunk", warc_filepath, i)
+
+        def finish_shard(warc_filepath):
+            manifest = manifests[warc_filepath]
+            output_path = manifest.data["output_path"]
+            merge_parquet_parts(
+                [chunk["part"] for chunk in manifest.chunks], output_path, config.row_group_size,
+                with_sample_rate(OUTPUT_SCHEMA, config.sample_rate),
+            )
+            shard_stats = FilterStats()
+            for chunk in manifest.chunks:
+                if chunk.get("filter"):
+                    shard_stats.merge(chunk["filter"])
+            write_json_atomic(shard_stats_path(output_path), {
+                "input_path": str(warc_filepath), "output_path": output_path, "rows": manifest.data["rows"],
+                "sample_rate": config.sample_rate or 1.0, **shard_stats.to_dict(),
+            })
+            run_stats.merge(shard_stats)
+            manifest.finish()
+            manifest.save()
+            shutil.rmtree(f"{output_path}.parts", ignore_errors=True)
+            output_files.append(output_path)
+            progress.update(1)
+
+        progress = tqdm(total=len(warc_filepaths))
+        for warc_filepath in warc_filepaths:
+            stem = Path(warc_filepath).stem
+            output_path = os.path.join(output_directory_path, stem + ".parquet")
+            manifest_path = os.path.join(output_directory_path, stem + ".manifest.json")
+            manifest = manifests[warc_filepath] = ShardManifest.load_or_create(
+                manifest_path, warc_filepath, output_path, config.sample_rate, config.sample_seed
+            )
+            if manifest.done:
+                if os.path.exists(shard_stats_path(output_path)):
+                    with open(shard_stats_path(output_path), encoding="utf-8") as f:
+                        run_stats.merge(json.load(f))
+                output_files.append(output_path)
+                progress.update(1)
+            elif manifest.chunks is None:
+                # Index all new shards in parallel; chunk jobs are queued as soon as a shard's index is ready
+                future = executor.submit(index_warc_chunks, warc_filepath, config.records_per_chunk)
+                pending[future] = ("index", warc_filepath, None)
+            elif manifest.pending_chunks():
+                submit_chunks(warc_filepath)
+            else:
+                finish_shard(warc_filepath)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                kind, warc_filepath, chunk_index = pending.pop(future)
+                manifest = manifests[warc_filepath]
+
+                if kind == "index":
+                    chunks = future.result()
+                    parts_dir = Path(f"{manifest.data['output_path']}.parts")
+                    parts_dir.mkdir(exist_ok=True)
+                    manifest.set_chunks(chunks, [parts_dir / f"part-{start:015d}.parquet" for start, _ in chunks])
+                    submit_chunks(warc_filepath)
+                else:
+                    _, stats = future.result()
+                    profiler.merge(stats.pop("profile"))
+                    manifest.commit_chunk(chunk_index, stats)
+                manifest.save()
+
+                if not manifest.pending_chunks():
+                    finish_shard(warc_filepath)
+
+            if config.profile_interval and time.perf_counter() - last_snapshot >= config.profile_interval:
+                write_profile()
+                last_snapshot = time.perf_counter()
+        progress.close()
+    write_json_atomic(
+        os.path.join(output_directory_path, "stats.json"),
+        {"sample_rate": config.sample_rate or 1.0, **run_stats.to_dict()},
+    )
+    write_profile()
+    return output_files
+
+
+def main(argv=None):
+    """Same as `cs336-data filter ...`."""
+    from cs336_data.cli import main as cli_main
+
+    cli_main(["filter", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    main()
@@ -158,35 +158,39 @@ def fuzzy_deduplicate_min_hash_lsh(
     return written_paths
 
 def fuzzy_deduplicate_min_hash_lsh_parquet(
-    parquet_path: str,
+    parquet_paths,
     num_hashes: int,
     num_bands: int,
     ngram: int,
     output_dir: str,
     threshold: float = 0.8,
     random_seed: int = 42,
-) -> List[str]:
+) -> Path:
     """
-    Perform fuzzy document deduplication using MinHash + LSH (datasketch).
+    Perform fuzzy document deduplication using MinHash + LSH (datasketch)
+    across the documents of one or more parquet files.
 
     Args:
-      paths: list of input file paths
+      parquet_paths: parquet file or list of parquet files (e.g. the shards
+        written by `deduplicate_parquets`), read in order
       num_hashes: number of minhash permutations
       num_bands: number of LSH bands
       ngram: n-gram length (in words)
-      output_dir: output directory for deduplicated documents
+      output_dir: output directory for deduplicated_data.parquet
       threshold: Jaccard similarity threshold for duplicate detection
       random_seed: random seed for reproducibility
     Returns:
-      List of written output file paths.
+      Path of the written parquet file.
     """
     os.makedirs(output_dir, exist_ok=True)
     random.seed(random_seed)
+    if isinstance(parquet_paths, (str, os.PathLike)):
+        parquet_paths = [parquet_paths]
 
     # Read, normalize, and shingle documents
     print("Reading and normalizing documents...")
     docs_text, docs_shingles = [], []
-    df = pd.read_parquet(parquet_path)
+    df = pd.concat([pd.read_parquet(path) for path in parquet_paths], ignore_index=True)
     for text in df["text"]:
         norm = normalize_text(text)
         shingles = word_ngrams(norm, ngram)
@@ -248,7 +252,9 @@ def fuzzy_deduplicate_min_hash_lsh_parquet(
            deduped_data.append(row) 
         
     output_df = pd.DataFrame(deduped_data)
-    output_df.to_parquet(Path(output_dir) / "deduplicated_data.parquet")
+    output_path = Path(output_dir) / "deduplicated_data.parquet"
+    output_df.to_parquet(output_path)
+    return output_path
 
 
 # Example usage:
@@ -1,9 +1,6 @@
-import fasttext
+import numpy as np
 
-# Load the FastText language identification model once
-# You can download it from: https://dl.fbaipublicfiles.com/fasttext/supervised-models/lid.176.bin
-_MODEL_PATH = "./models/lid.176.bin"
-_lang_model = fasttext.load_model(_MODEL_PATH)
+from cs336_data.model_registry import get_model
 
 def identify_language(text: str) -> tuple[str, float]:
     """
@@ -20,11 +17,31 @@ def identify_language(text: str) -> tuple[str, float]:
     if not text.strip():
         return ("unknown", 0.0)
 
-    labels, scores = _lang_model.predict(text.replace("\n", " "), k=1)
+    labels, scores = get_model("language").predict(text.replace("\n", " "), k=1)
     lang_code = labels[0].replace("__label__", "")
     confidence = float(scores[0])
     return lang_code, confidence
 
+def identify_language_batch(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched `identify_language`: one fastText call for the whole list.
+
+    Args:
+        texts (list[str]): Input Unicode texts.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: language codes (str) and confidence scores (float64),
+                                       with ("unknown", 0.0) for blank texts.
+    """
+    langs = np.full(len(texts), "unknown", dtype=object)
+    confidences = np.zeros(len(texts), dtype=np.float64)
+    indices = [i for i, text in enumerate(texts) if text.strip()]
+    if indices:
+        labels, scores = get_model("language").predict([texts[i].replace("\n", " ") for i in indices], k=1)
+        langs[indices] = [label[0].replace("__label__", "") for label in labels]
+        confidences[indices] = [score[0] for score in scores]
+    return langs.astype(str), confidences
+
 if __name__ == "__main__":
     # Example usage
     sample_text = "我们团队昨天 had a long discussion about model optimization，最后决定先做一个 small-scale prototype 来测试想法。"
@@ -0,0 +1,259 @@
+import concurrent.futures
+import multiprocessing
+import os
+from pathlib import Path
+
+import numpy as np
+from xxhash import xxh3_64_intdigest
+
+# Hashes buffered by `LineHashCounter.add` before they are merged into its table
+MERGE_BUFFER_SIZE = 1 << 22
+# Counts saturate here: a line is either seen once or more than once
+MAX_COUNT = 2
+
+
+def _hash_line(line: str) -> int:
+    return xxh3_64_intdigest(line.encode("utf-8", errors="ignore"))
+
+
+def hash_lines(lines) -> np.ndarray:
+    """
+    64-bit hashes (XXH3) of `lines`, as a uint64 array.
+
+    64 bits keep the expected number of colliding pairs below one up to about
+    four billion distinct lines, at a fifth of the memory of a SHA-1 hex digest.
+    XXH3 is a non-cryptographic hash several times cheaper per line than blake2b,
+    and the hashes are collected straight into the array.
+    """
+    return np.fromiter(map(_hash_line, lines), dtype=np.uint64)
+
+
+def _merge_runs(keys_a: np.ndarray, counts_a: np.ndarray, keys_b: np.ndarray, counts_b: np.ndarray):
+    """Merge two sorted runs of distinct keys and their saturated counts in one linear pass."""
+    keys = np.concatenate([keys_a, keys_b])
+    counts = np.concatenate([counts_a, counts_b])
+    if len(keys) == 0:
+        return keys, counts
+    # Timsort finds the two sorted runs and merges them
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    # Each key occurs at most once per run, so its summed count is at most 2 * MAX_COUNT
+    counts = np.minimum(np.add.reduceat(counts[order], starts), MAX_COUNT).astype(np.uint8)
+    return keys[starts], counts
+
+
+class LineHashCounter:
+    """
+    Counts of 64-bit line hashes in flat NumPy arrays: sorted uint64 keys and
+    uint8 counts saturating at MAX_COUNT, i.e. 9 bytes per distinct line
+    instead of ~200 for a Counter of hex digests.
+
+    Added hashes are buffered and turned into a sorted run `buffer_size` at a
+    time. Runs are size-tiered: a new run is merged into the previous one
+    while it is at least as large, so each hash takes part in O(log n) linear
+    merges rather than the whole table being rewritten for every buffer.
+    Lookups compact the runs into one table (`keys`, `counts`).
+
+    Usage:
+        counter = LineHashCounter()
+        for lines in documents:
+            counter.add(hash_lines(lines))
+        duplicate = counter.counts_of(hashes) > 1
+    """
+    def __init__(self, buffer_size: int = MERGE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        # Sorted (keys, counts) runs, largest first
+        self._runs = []
+        self._buffer = []
+        self._buffered = 0
+
+    def add(self, hashes: np.ndarray):
+        """Count one occurrence of every hash in `hashes`."""
+        if len(hashes) == 0:
+            return
+        self._buffer.append(np.asarray(hashes, dtype=np.uint64))
+        self._buffered += len(hashes)
+        if self._buffered >= self.buffer_size:
+            self._merge_buffer()
+
+    def _merge_buffer(self):
+        if not self._buffer:
+            return
+        keys, counts = np.unique(np.concatenate(self._buffer), return_counts=True)
+        self._buffer = []
+        self._buffered = 0
+        self._push(keys, np.minimum(counts, MAX_COUNT).astype(np.uint8))
+
+    def _push(self, keys: np.ndarray, counts: np.ndarray):
+        """Add a sorted run of distinct `keys` and their saturated `counts`."""
+        self._runs.append((keys, counts))
+        while len(self._runs) > 1 and len(self._runs[-1][0]) >= len(self._runs[-2][0]):
+            newer = self._runs.pop()
+            self._runs.append(_merge_runs(*self._runs.pop(), *newer))
+
+    def _compact(self):
+        self._merge_buffer()
+        while len(self._runs) > 1:
+            newer = self._runs.pop()
+            self._runs.append(_merge_runs(*self._runs.pop(), *newer))
+
+    @property
+    def keys(self) -> np.ndarray:
+        """The sorted distinct hashes counted."""
+        self._compact()
+        return self._runs[0][0] if self._runs else np.empty(0, dtype=np.uint64)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """The saturated counts of `keys`."""
+        self._compact()
+        return self._runs[0][1] if self._runs else np.empty(0, dtype=np.uint8)
+
+    def merge(self, other: "LineHashCounter"):
+        """Add the counts of another counter."""
+        self._merge_buffer()
+        self._push(other.keys, other.counts)
+
+    def counts_of(self, hashes: np.ndarray) -> np.ndarray:
+        """Saturated counts (0, 1 or MAX_COUNT) of `hashes`."""
+        keys, counts = self.keys, self.counts
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(keys) == 0:
+            return np.zeros(len(hashes), dtype=np.uint8)
+        positions = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+        return np.where(keys[positions] == hashes, counts[positions], 0).astype(np.uint8)
+
+    def duplicates(self) -> "DuplicateHashSet":
+        """The hashes counted more than once."""
+        return DuplicateHashSet(self.keys[self.counts > 1])
+
+    def __len__(self) -> int:
+        """Number of distinct hashes counted."""
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(keys.nbytes + counts.nbytes for keys, counts in self._runs) + \
+            sum(buffer.nbytes for buffer in self._buffer)
+
+
+class DuplicateHashSet:
+    """
+    The line hashes seen more than once, as a sorted uint64 array (possibly a
+    read-only memory map), queried with binary search.
+    """
+    def __init__(self, hashes: np.ndarray):
+        self.hashes = hashes
+
+    @classmethod
+    def load(cls, path) -> "DuplicateHashSet":
+        """Memory-map a set saved as .npy, so it is paged in from disk as needed."""
+        return cls(np.load(path, mmap_mode="r"))
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of which `hashes` are duplicates."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(self.hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return np.asarray(self.hashes[positions] == hashes)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+
+def partition_path(spill_dir, partition: int) -> Path:
+    return Path(spill_dir) / f"part-{partition:05d}.u64"
+
+
+class HashSpiller:
+    """
+    Spill line hashes to `num_partitions` files in `spill_dir` by their leading
+    bits, so that each partition holds every occurrence of its hashes and can
+    be counted on its own. Hashes are buffered and appended to the partition
+    files `buffer_size` at a time.
+    """
+    def __init__(self, spill_dir, num_partitions: int = 256, buffer_size: int = MERGE_BUFFER_SIZE):
+        if num_partitions & (num_partitions - 1) or not 1 <= num_partitions <= 1 << 16:
+            raise ValueError(f"num_partitions must be a power of two up to 65536, got {num_partitions}")
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.num_partitions = num_partitions
+        self.buffer_size = buffer_size
+        self._shift = np.uint64(64 - (num_partitions.bit_length() - 1))
+        self._buffer = []
+        self._buffered = 0
+
+    def add(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        self._buffer.append(np.asarray(hashes, dtype=np.uint64))
+        self._buffered += len(hashes)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Append buffered hashes to their partition files."""
+        if not self._buffer:
+            return
+        hashes = np.concatenate(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        # With one partition the shift is 64, which NumPy does not define for uint64
+        partitions = hashes >> self._shift if self.num_partitions > 1 else np.zeros(len(hashes), dtype=np.uint64)
+        order = np.argsort(partitions, kind="stable")
+        bounds = np.searchsorted(partitions[order], np.arange(self.num_partitions + 1, dtype=np.uint64))
+        for partition in np.flatnonzero(np.diff(bounds)):
+            with open(partition_path(self.spill_dir, partition), "ab") as f:
+                hashes[order[bounds[partition]:bounds[partition + 1]]].astype("<u8").tofile(f)
+
+
+def _count_partition(paths, output_path) -> int:
+    """Write the hashes occurring more than once in the spill files `paths` to `output_path`."""
+    hashes = np.concatenate([np.fromfile(path, dtype="<u8") for path in paths])
+    keys, counts = np.unique(hashes, return_counts=True)
+    duplicates = keys[counts > 1].astype(np.uint64)
+    np.save(output_path, duplicates)
+    for path in paths:
+        os.remove(path)
+    return len(duplicates)
+
+
+def count_partitions(spill_dir, num_partitions: int = 256, num_workers: int | None = None) -> DuplicateHashSet:
+    """
+    Count the partitions spilled into `spill_dir` (by any number of
+    `HashSpiller`s, in it or its subdirectories) in parallel processes.
+
+    Each worker loads one partition, so peak memory per worker is 16 bytes
+    per line occurrence in it. Partitions are ordered by their hashes' leading
+    bits, so the per-partition duplicates are concatenated into one sorted
+    `<spill_dir>/duplicates.npy`, which is memory-mapped. Spill files are
+    deleted once counted.
+    """
+    spill_dir = Path(spill_dir)
+    # One directory walk for all partitions
+    jobs = {}
+    for path in sorted(spill_dir.rglob("part-*.u64")):
+        jobs.setdefault(int(path.stem.removeprefix("part-")), []).append(path)
+    mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    counts = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context) as executor:
+        futures = {
+            executor.submit(_count_partition, paths, spill_dir / f"duplicates-{partition:05d}.npy"): partition
+            for partition, paths in jobs.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            counts[futures[future]] = future.result()
+
+    output_path = spill_dir / "duplicates.npy"
+    duplicates = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.uint64, shape=(sum(counts.values()),))
+    offset = 0
+    for partition in sorted(counts):
+        part_path = spill_dir / f"duplicates-{partition:05d}.npy"
+        duplicates[offset:offset + counts[partition]] = np.load(part_path)
+        offset += counts[partition]
+        os.remove(part_path)
+    duplicates.flush()
+    del duplicates
+    return DuplicateHashSet.load(output_path)
@@ -0,0 +1,112 @@
+import json
+import os
+from collections import Counter
+
+from cs336_data.uri_io import stat_uri
+
+
+def write_json_atomic(path, obj):
+    """Write `obj` as JSON to `path` so that readers never observe a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ShardManifest:
+    """
+    Progress record for filtering one WARC shard, persisted as JSON next to its output.
+
+    Fields:
+        input_path, size, mtime: the input shard (a path or URI); a manifest whose
+            size or mtime no longer matches the input is discarded.
+        output_path: the merged parquet output.
+        sample_rate, sample_seed: the record sample being processed (None: all
+            records); a manifest of a different sample is discarded.
+        status: "pending", "running" or "done".
+        chunks: [{"start", "end", "part", "done", "records", "rows", "skipped", "filter"}, ...]
+            in file order, "filter" being the chunk's filtering statistics.
+        record_offset: offset up to which every record has been committed.
+        rows: number of committed output rows.
+        skipped: committed records skipped on their headers, per skip reason.
+    """
+    def __init__(self, path, data: dict):
+        self.path = str(path)
+        self.data = data
+
+    @classmethod
+    def load_or_create(cls, path, input_path, output_path, sample_rate: float | None = None,
+                       sample_seed: int = 0) -> "ShardManifest":
+        size, mtime = stat_uri(input_path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if (data["size"] == size and data["mtime"] == mtime and data.get("sample_rate") == sample_rate
+                    and data.get("sample_seed", 0) == sample_seed):
+                return cls(path, data)
+        data = {
+            "input_path": str(input_path),
+            "size": size,
+            "mtime": mtime,
+            "output_path": str(output_path),
+            "sample_rate": sample_rate,
+            "sample_seed": sample_seed,
+            "status": "pending",
+            "chunks": None,
+            "record_offset": 0,
+            "rows": 0,
+            "skipped": {},
+        }
+        return cls(path, data)
+
+    @property
+    def done(self) -> bool:
+        return self.data["status"] == "done" and os.path.exists(self.data["output_path"])
+
+    @property
+    def chunks(self):
+        return self.data["chunks"]
+
+    def set_chunks(self, chunks, part_paths):
+        self.data["chunks"] = [
+            {
+                "start": start, "end": end, "part": str(part), "done": False,
+                "records": 0, "rows": 0, "skipped": {}, "filter": None,
+            }
+            for (start, end), part in zip(chunks, part_paths)
+        ]
+        self.data["status"] = "running"
+
+    def pending_chunks(self) -> list[int]:
+        """Indices of chunks whose output has not been committed (or has since gone missing)."""
+        return [
+            i for i, chunk in enumerate(self.chunks)
+            if not (chunk["done"] and os.path.exists(chunk["part"]))
+        ]
+
+    def commit_chunk(self, index: int, stats: dict):
+        """Mark a chunk as committed with its "records", "rows" and "skipped" counts and "filter" statistics."""
+        chunk = self.chunks[index]
+        chunk.update(
+            done=True, records=stats["records"], rows=stats["rows"],
+            skipped=stats.get("skipped", {}), filter=stats.get("filter"),
+        )
+        done_chunks = [c for c in self.chunks if c["done"]]
+        self.data["rows"] = sum(c["rows"] for c in done_chunks)
+        self.data["skipped"] = dict(sum((Counter(c["skipped"]) for c in done_chunks), Counter()))
+        # Advance the committed offset over the longest prefix of finished chunks
+        offset = 0
+        for c in self.chunks:
+            if not c["done"]:
+                break
+            offset = c["end"] if c["end"] is not None else self.data["size"]
+        self.data["record_offset"] = offset
+
+    def finish(self):
+        self.data["status"] = "done"
+        self.data["record_offset"] = self.data["size"]
+
+    def save(self):
+        write_json_atomic(self.path, self.data)
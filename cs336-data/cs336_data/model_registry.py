@@ -0,0 +1,73 @@
+import os
+import fasttext
+
+# Model files, looked up in the model directory unless overridden
+MODEL_FILES = {
+    # https://dl.fbaipublicfiles.com/fasttext/supervised-models/lid.176.bin
+    "language": "lid.176.bin",
+    "nsfw": "jigsaw_fasttext_bigrams_nsfw_final.bin",
+    "toxic": "jigsaw_fasttext_bigrams_hatespeech_final.bin",
+    "quality": "low_quality_classifier_q.bin",
+}
+
+# The model directory defaults to ./models and can be set with $CS336_DATA_MODEL_DIR;
+# a single model can be pointed elsewhere with e.g. $CS336_DATA_NSFW_MODEL.
+MODEL_DIR_ENV = "CS336_DATA_MODEL_DIR"
+DEFAULT_MODEL_DIR = "./models"
+
+_configured_dir = None
+_configured_paths = {}
+_models = {}
+
+
+def configure_models(model_dir: str | None = None, **paths: str):
+    """
+    Override where models are loaded from (takes precedence over the environment).
+
+    Args:
+        model_dir: Directory holding the files in MODEL_FILES.
+        **paths: Per-model file paths, e.g. `configure_models(language="/models/lid.176.bin")`.
+    """
+    global _configured_dir
+    unknown = set(paths) - set(MODEL_FILES)
+    if unknown:
+        raise ValueError(f"Unknown models: {sorted(unknown)}; expected one of {sorted(MODEL_FILES)}")
+    if model_dir is not None:
+        _configured_dir = str(model_dir)
+    _configured_paths.update({name: str(path) for name, path in paths.items()})
+
+
+def model_path(name: str) -> str:
+    """Resolve the file path of model `name`."""
+    if name not in MODEL_FILES:
+        raise ValueError(f"Unknown model {name!r}; expected one of {sorted(MODEL_FILES)}")
+    if name in _configured_paths:
+        return _configured_paths[name]
+    env_path = os.environ.get(f"CS336_DATA_{name.upper()}_MODEL")
+    if env_path:
+        return env_path
+    model_dir = _configured_dir or os.environ.get(MODEL_DIR_ENV) or DEFAULT_MODEL_DIR
+    return os.path.join(model_dir, MODEL_FILES[name])
+
+
+def get_model(name: str):
+    """Return model `name`, loading it on first use."""
+    model = _models.get(name)
+    if model is None:
+        model = _models[name] = fasttext.load_model(model_path(name))
+    return model
+
+
+def preload_models(names=None):
+    """
+    Load models up front, e.g. in the parent process before a fork-based process
+    pool starts, so that workers share the model pages copy-on-write instead of
+    each reading its own copy from disk.
+    """
+    for name in names or MODEL_FILES:
+        get_model(name)
+
+
+def unload_models():
+    """Drop all loaded models (the next `get_model` reloads from the configured path)."""
+    _models.clear()
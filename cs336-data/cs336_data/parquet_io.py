@@ -0,0 +1,156 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Schema metadata key of the fraction of input records a sampled run processed
+SAMPLE_RATE_KEY = b"cs336.sample_rate"
+
+
+def with_sample_rate(schema: pa.Schema, sample_rate: float | None) -> pa.Schema:
+    """`schema` tagged with `sample_rate` (unchanged if None, i.e. all records)."""
+    if sample_rate is None:
+        return schema
+    return schema.with_metadata({**(schema.metadata or {}), SAMPLE_RATE_KEY: repr(sample_rate).encode()})
+
+
+def parquet_sample_rate(path) -> float:
+    """
+    The sample rate a parquet file was written with (see `with_sample_rate`),
+    1.0 for files of full runs. Divide counts over the file by it to estimate
+    counts over all records.
+    """
+    metadata = pq.read_schema(path).metadata or {}
+    return float(metadata.get(SAMPLE_RATE_KEY, b"1.0"))
+
+
+class StreamingParquetWriter:
+    """
+    Write rows to a parquet file incrementally, one row group at a time.
+
+    Rows are buffered column-wise and flushed as a row group every
+    `row_group_size` rows, so memory stays bounded by one row group no matter
+    how many rows are written. Data goes to `<path>.tmp` and is renamed to
+    `path` on a successful close, so a file at `path` is always complete.
+
+    Usage:
+        with StreamingParquetWriter(path, schema, row_group_size=1000) as writer:
+            writer.write((url, lang, text))
+    """
+    def __init__(self, path, schema: pa.Schema, row_group_size: int = 1000):
+        self.path = str(path)
+        self.tmp_path = f"{self.path}.tmp"
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.num_rows = 0
+        self._columns = [[] for _ in schema.names]
+        self._writer = pq.ParquetWriter(self.tmp_path, schema)
+
+    def write(self, row):
+        """Append one row, given as a tuple in schema order or a dict keyed by column name."""
+        if isinstance(row, dict):
+            row = [row[name] for name in self.schema.names]
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        self.num_rows += 1
+        if len(self._columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a row group."""
+        if not self._columns[0]:
+            return
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(self._columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._columns = [[] for _ in self.schema.names]
+
+    def write_table(self, table: pa.Table):
+        """Append an existing arrow table (e.g. a row group read from another file)."""
+        self.flush()
+        self._writer.write_table(table.cast(self.schema), row_group_size=self.row_group_size)
+        self.num_rows += table.num_rows
+
+    def close(self):
+        """Flush remaining rows, finalize the file and move it into place."""
+        self.flush()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discard everything written so far."""
+        self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ShardedParquetWriter:
+    """
+    Write tables to numbered parquet files `<prefix>-00000.parquet`, ...,
+    starting a new file once the current one reaches `target_bytes` on disk,
+    so large outputs can be processed in parallel. Each file goes through a
+    `StreamingParquetWriter`, so it is either complete or absent. Tables are
+    never split across files, so a file overshoots the target by at most
+    the last table written to it.
+
+    Usage:
+        with ShardedParquetWriter(prefix, schema, target_bytes=256 << 20) as writer:
+            for table in tables:
+                writer.write_table(table)
+        paths = writer.paths
+    """
+    def __init__(self, prefix, schema: pa.Schema, target_bytes: int = 256 << 20, row_group_size: int = 1000):
+        self.prefix = str(prefix)
+        self.schema = schema
+        self.target_bytes = target_bytes
+        self.row_group_size = row_group_size
+        self.paths = []
+        self.num_rows = 0
+        self._writer = None
+
+    def _open(self):
+        path = f"{self.prefix}-{len(self.paths):05d}.parquet"
+        self._writer = StreamingParquetWriter(path, self.schema, row_group_size=self.row_group_size)
+
+    def write_table(self, table: pa.Table):
+        if self._writer is None:
+            self._open()
+        self._writer.write_table(table)
+        self.num_rows += table.num_rows
+        if os.path.getsize(self._writer.tmp_path) >= self.target_bytes:
+            self.paths.append(self._writer.close())
+            self._writer = None
+
+    def close(self) -> list[str]:
+        """Finalize the last file; returns all files (none if nothing was written)."""
+        if self._writer is not None:
+            self.paths.append(self._writer.close())
+            self._writer = None
+        return self.paths
+
+    def abort(self):
+        """Discard the file being written; completed files are kept."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,115 @@
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+
+from cs336_data.manifest import write_json_atomic
+
+
+@dataclass
+class StageProfile:
+    """
+    Counters of one pipeline stage.
+
+    Times are in seconds; CPU time is the CPU time of the calling thread spent
+    in the stage, so work done meanwhile by other threads (such as the WARC
+    prefetch thread) is not charged to it.
+    Sizes are payload bytes for WARC reading and extraction input, text
+    characters for everything downstream of extraction, and file bytes for
+    the output of writing.
+    """
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    records_in: int = 0
+    records_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    def merge(self, other: "StageProfile"):
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["records_per_second"] = self.records_in / self.wall_seconds if self.wall_seconds else 0.0
+        data["mb_per_second"] = self.bytes_in / self.wall_seconds / 1e6 if self.wall_seconds else 0.0
+        return data
+
+
+class PipelineProfiler:
+    """
+    Per-stage wall time, CPU time and record/byte throughput of the filtering pipeline.
+
+    Each worker fills a profiler for the chunk it processes and returns
+    `to_dict()`; the parent `merge`s those into one profiler for the whole run
+    and writes it with `write_json`.
+
+    Usage:
+        profiler = PipelineProfiler()
+        with profiler.stage("extract") as stats:
+            texts = [extract(payload) for payload in payloads]
+            stats.records_in += len(payloads)
+            stats.records_out += len(texts)
+        for record in profiler.iterate("warc_read", records):
+            ...
+    """
+    def __init__(self):
+        self.stages: dict[str, StageProfile] = {}
+        self.notes: dict[str, str] = {}
+
+    def stats(self, name: str) -> StageProfile:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageProfile()
+        return stats
+
+    def note(self, name: str, text: str):
+        """Attach a note on how to read stage `name`'s numbers to the report."""
+        self.notes[name] = text
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the block as part of stage `name`; yields its StageProfile to update counts."""
+        stats = self.stats(name)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield stats
+        finally:
+            stats.wall_seconds += time.perf_counter() - wall
+            stats.cpu_seconds += time.thread_time() - cpu
+
+    def iterate(self, name: str, iterable):
+        """Yield from `iterable`, timing each step as stage `name` and counting items as records_in."""
+        stats = self.stats(name)
+        iterator = iter(iterable)
+        while True:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                stats.wall_seconds += time.perf_counter() - wall
+                stats.cpu_seconds += time.thread_time() - cpu
+            stats.records_in += 1
+            yield item
+
+    def merge(self, other):
+        """Add the counters of another profiler, or of its `to_dict()`."""
+        if isinstance(other, PipelineProfiler):
+            other = other.to_dict()
+        for name, data in other.get("stages", {}).items():
+            self.stats(name).merge(StageProfile(**{field.name: data[field.name] for field in fields(StageProfile)}))
+            if "note" in data:
+                self.notes[name] = data["note"]
+
+    def to_dict(self) -> dict:
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = stats.to_dict()
+            if name in self.notes:
+                stages[name]["note"] = self.notes[name]
+        return {"stages": stages}
+
+    def write_json(self, path, **extra):
+        """Atomically write the summary, plus any `extra` top-level fields, to `path`."""
+        write_json_atomic(path, {**extra, **self.to_dict()})
@@ -1,16 +1,35 @@
 import re
 
+# Robust email regex pattern that handles most valid email forms
+EMAIL_PATTERN = re.compile(
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+)
+
+PHONE_PATTERN = re.compile(
+    r"""
+    (?:(?:\+?1[\s.-]*)?)                 # optional country code (+1, 1, +1-)
+    (?:\(?\d{3}\)?[\s.-]*)               # area code with or without parentheses
+    \d{3}[\s.-]*\d{4}                    # 7-digit local number
+    """,
+    re.VERBOSE
+)
+
+# Regex for valid IPv4 address (0–255 per octet)
+IPV4_PATTERN = re.compile(
+    r'\b('
+    r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # first octet
+    r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # second octet
+    r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # third octet
+    r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'     # fourth octet
+    r')\b'
+)
+
 def mask_emails(text: str) -> str:
     """
     Replace all email addresses in the given text with '|||EMAIL_ADDRESS|||'.
     """
-    # Robust email regex pattern that handles most valid email forms
-    email_pattern = re.compile(
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-    )
-    
     # Replace all detected emails
-    return email_pattern.subn('|||EMAIL_ADDRESS|||', text)
+    return EMAIL_PATTERN.subn('|||EMAIL_ADDRESS|||', text)
 
 def mask_phone_numbers(text: str) -> str:
     """
@@ -23,30 +42,60 @@ def mask_phone_numbers(text: str) -> str:
     - 123.456.7890
     - +1 (123)4567890
     """
-    phone_pattern = re.compile(
-        r"""
-        (?:(?:\+?1[\s.-]*)?)                 # optional country code (+1, 1, +1-)
-        (?:\(?\d{3}\)?[\s.-]*)               # area code with or without parentheses
-        \d{3}[\s.-]*\d{4}                    # 7-digit local number
-        """,
-        re.VERBOSE
-    )
-    
-    return phone_pattern.subn("|||PHONE_NUMBER|||", text)
+    return PHONE_PATTERN.subn("|||PHONE_NUMBER|||", text)
 
 def mask_ip_addresses(text: str) -> str:
     """
     Replace all IPv4 addresses in the text with '|||IP_ADDRESS|||'.
     Matches standard IPv4 patterns with values from 0.0.0.0 to 255.255.255.255.
     """
-    # Regex for valid IPv4 address (0–255 per octet)
-    ipv4_pattern = re.compile(
-        r'\b('
-        r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # first octet
-        r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # second octet
-        r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.'   # third octet
-        r'(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'     # fourth octet
-        r')\b'
-    )
-    
-    return ipv4_pattern.subn("|||IP_ADDRESS|||", text)
+    return IPV4_PATTERN.subn("|||IP_ADDRESS|||", text)
+
+
+class PIIMasker:
+    """
+    Mask emails, phone numbers and IPv4 addresses in a single pass.
+
+    All patterns are compiled once into one alternation (email, then phone,
+    then IP, the order `mask_emails`/`mask_phone_numbers`/`mask_ip_addresses`
+    are usually applied in), so each document is scanned and rebuilt once.
+    Documents without an '@' skip the email alternative, and documents without
+    any digit are returned untouched without running a regex at all. Results
+    only differ from the three sequential passes where matches of different
+    types overlap.
+
+    Usage:
+        masker = PIIMasker()
+        masked_text, counts = masker.mask(text)  # counts: {"email": 1, "phone": 0, "ip": 2}
+    """
+    REPLACEMENTS = {
+        "email": "|||EMAIL_ADDRESS|||",
+        "phone": "|||PHONE_NUMBER|||",
+        "ip": "|||IP_ADDRESS|||",
+    }
+
+    def __init__(self):
+        # The IPv4 pattern's capturing groups would shadow `lastgroup`, so make them non-capturing
+        ip = IPV4_PATTERN.pattern.replace("(", "(?:")
+        email = f"(?P<email>{EMAIL_PATTERN.pattern})"
+        phone = f"(?P<phone>{PHONE_PATTERN.pattern})"
+        ip = f"(?P<ip>{ip})"
+        self._all_pattern = re.compile("|".join([email, phone, ip]), re.VERBOSE)
+        self._digit_pattern = re.compile("|".join([phone, ip]), re.VERBOSE)
+        self._has_digit = re.compile(r"\d").search
+
+    def mask(self, text: str) -> tuple[str, dict[str, int]]:
+        counts = dict.fromkeys(self.REPLACEMENTS, 0)
+        if "@" in text:
+            pattern = self._all_pattern
+        elif self._has_digit(text):
+            pattern = self._digit_pattern
+        else:
+            return text, counts
+
+        def replace(match):
+            kind = match.lastgroup
+            counts[kind] += 1
+            return self.REPLACEMENTS[kind]
+
+        return pattern.sub(replace, text), counts
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+
+
+def content_hash(data, *extra) -> bytes:
+    """
+    Fast 128-bit digest of a payload (bytes) or text (str), used as a cache key.
+    Further parts the result depends on (e.g. a Content-Type header) can be
+    passed as `extra` without concatenating them to the payload.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (data, *extra):
+        if isinstance(part, str):
+            part = part.encode("utf-8", errors="surrogatepass")
+        digest.update(part)
+        if extra:
+            digest.update(b"\0")
+    return digest.digest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for results computed from a payload or text.
+
+    The first tier is an in-process LRU of at most `max_entries` entries. If
+    `db_path` is given, misses fall through to a SQLite file that can be shared
+    by all workers of a run and across runs; new results are written to it in
+    batches of `commit_every`. Keys are (namespace, digest) pairs, e.g.
+    ("extract", content_hash(payload)), and values must be picklable.
+
+    Cached results are only valid for the code and thresholds that produced
+    them: use a new `db_path` after changing filters.
+    """
+    MISSING = object()
+
+    def __init__(self, max_entries: int = 100_000, db_path=None, commit_every: int = 100):
+        self.max_entries = max_entries
+        self.db_path = str(db_path) if db_path is not None else None
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._conn = None
+        self._conn_pid = None
+        self._pending = {}
+
+    def _db(self):
+        # SQLite connections must not cross a fork, so every process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            # Autocommit: reads take no lock, and writes open their own transactions in `flush`
+            self._conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            self._conn_pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(namespace TEXT, key BLOB, value BLOB, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def _remember(self, lru_key, value):
+        self._lru[lru_key] = value
+        self._lru.move_to_end(lru_key)
+        if len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, namespace: str, key: bytes):
+        """Return the cached value, or ResultCache.MISSING."""
+        lru_key = (namespace, key)
+        value = self._lru.get(lru_key, self.MISSING)
+        if value is not self.MISSING:
+            self._lru.move_to_end(lru_key)
+            self.hits += 1
+            return value
+        if lru_key in self._pending:
+            value = pickle.loads(self._pending[lru_key])
+            self._remember(lru_key, value)
+            self.hits += 1
+            return value
+        if self.db_path is not None:
+            row = self._db().execute(
+                "SELECT value FROM results WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None:
+                value = pickle.loads(row[0])
+                self._remember(lru_key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return self.MISSING
+
+    def put(self, namespace: str, key: bytes, value):
+        self._remember((namespace, key), value)
+        if self.db_path is not None:
+            self._pending[(namespace, key)] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(self._pending) >= self.commit_every:
+                self.flush()
+
+    def flush(self):
+        """Write pending results to the on-disk tier in one transaction."""
+        if not self._pending:
+            return
+        conn = self._db()
+        rows = [(namespace, key, value) for (namespace, key), value in self._pending.items()]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO results (namespace, key, value) VALUES (?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._pending = {}
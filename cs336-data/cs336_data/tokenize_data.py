@@ -0,0 +1,49 @@
+import numpy as np
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+
+def load_tokenizer(tokenizer_name: str = "gpt2"):
+    # transformers is heavy and only needed here, so it is imported on first use
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(tokenizer_name)
+
+
+def tokenize_parquets(input_paths, output_path, tokenizer=None, batch_size: int = 1024,
+                      dtype=np.uint16) -> int:
+    """
+    Tokenize the `text` column of parquet files into one flat binary file of token ids.
+
+    Every document is followed by the tokenizer's EOS token. Texts are read and
+    encoded `batch_size` at a time and appended to `output_path` as they are
+    encoded, so memory does not grow with the corpus.
+
+    Args:
+        input_paths: Parquet files with a `text` column.
+        output_path: Output `.bin` file of `dtype` token ids (np.memmap-able).
+        tokenizer: A Hugging Face tokenizer or the name of one (default "gpt2").
+        batch_size (int): Documents encoded per call.
+        dtype: Token id type; uint16 holds vocabularies of up to 65536 tokens.
+
+    Returns:
+        int: Number of tokens written.
+    """
+    if tokenizer is None or isinstance(tokenizer, str):
+        tokenizer = load_tokenizer(tokenizer or "gpt2")
+    if len(tokenizer) > np.iinfo(dtype).max + 1:
+        raise ValueError(f"A vocabulary of {len(tokenizer)} tokens does not fit in {np.dtype(dtype).name}")
+
+    num_tokens = 0
+    with open(output_path, "wb") as f:
+        for path in input_paths:
+            parquet_file = pq.ParquetFile(path)
+            with tqdm(total=parquet_file.metadata.num_rows, desc=f"Tokenizing {path}") as progress:
+                for batch in parquet_file.iter_batches(batch_size=batch_size, columns=["text"]):
+                    texts = [text + tokenizer.eos_token for text in batch.column("text").to_pylist()]
+                    ids = tokenizer(texts)["input_ids"]
+                    ids_array = np.fromiter((i for doc in ids for i in doc), dtype=dtype)
+                    ids_array.tofile(f)
+                    num_tokens += len(ids_array)
+                    progress.update(len(texts))
+    return num_tokens
@@ -0,0 +1,157 @@
+import io
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import unquote, urlparse
+
+import requests
+
+# Bytes fetched per HTTP range request; reads are served from the last block
+HTTP_BLOCK_SIZE = 8 << 20
+HTTP_RETRIES = 3
+
+_sessions = threading.local()
+
+
+def _session() -> requests.Session:
+    """One HTTP session per thread (and process), so connections are reused across files and requests."""
+    session = getattr(_sessions, "session", None)
+    if session is None or _sessions.pid != os.getpid():
+        session = _sessions.session = requests.Session()
+        _sessions.pid = os.getpid()
+    return session
+
+
+def uri_scheme(uri) -> str:
+    """"file" for local paths and file:// URIs, else the URI scheme (e.g. "http", "s3")."""
+    scheme = urlparse(str(uri)).scheme
+    # A one-letter scheme is a Windows drive letter
+    return "file" if len(scheme) <= 1 else scheme
+
+
+def is_local(uri) -> bool:
+    return uri_scheme(uri) == "file"
+
+
+def local_path(uri) -> str:
+    """The filesystem path of a local path or file:// URI."""
+    uri = str(uri)
+    return unquote(urlparse(uri).path) if uri.startswith("file://") else uri
+
+
+def _request(method: str, url: str, headers=None) -> requests.Response:
+    for attempt in range(HTTP_RETRIES):
+        try:
+            response = _session().request(method, url, headers=headers, timeout=60)
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response
+        except requests.ConnectionError:
+            if attempt == HTTP_RETRIES - 1:
+                raise
+        time.sleep(2 ** attempt)
+    response.raise_for_status()
+    return response
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Seekable read-only file over an HTTP(S) URL, fetched with range requests of
+    `block_size` bytes. Sequential reads are served from the current block, so a
+    WARC is streamed with one request per block over a reused connection.
+    """
+    def __init__(self, url: str, block_size: int = HTTP_BLOCK_SIZE, size: int | None = None):
+        self.url = url
+        self.block_size = block_size
+        self.size = size if size is not None else stat_uri(url)[0]
+        self._pos = 0
+        self._block_start = 0
+        self._block = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def _fetch(self, start: int, length: int):
+        end = min(start + length, self.size) - 1
+        response = _request("GET", self.url, headers={"Range": f"bytes={start}-{end}"})
+        content = response.content
+        if response.status_code != 206:
+            # A server without range support sends the whole file, which is only usable from the start
+            if start != 0:
+                raise OSError(f"{self.url} does not support range requests (status {response.status_code})")
+            content = content[:length]
+        self._block_start, self._block = start, content
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self.size:
+            return 0
+        offset = self._pos - self._block_start
+        if not 0 <= offset < len(self._block):
+            self._fetch(self._pos, max(len(buffer), self.block_size))
+            offset = 0
+        n = min(len(buffer), len(self._block) - offset)
+        buffer[:n] = self._block[offset:offset + n]
+        self._pos += n
+        return n
+
+
+def _fsspec_filesystem(uri):
+    try:
+        import fsspec
+    except ImportError:
+        raise ValueError(f"Reading {uri} needs fsspec (and its backend for {uri_scheme(uri)}://)") from None
+    return fsspec.core.url_to_fs(str(uri))
+
+
+def open_uri(uri, block_size: int = HTTP_BLOCK_SIZE):
+    """
+    Open a local path or URI for binary reading.
+
+    Local paths and file:// URIs are opened directly, http(s):// URLs with
+    `HTTPRangeFile`, and anything else (s3://, gs://, ...) through fsspec if it
+    is installed. The returned file is seekable.
+    """
+    scheme = uri_scheme(uri)
+    if scheme == "file":
+        return open(local_path(uri), "rb")
+    if scheme in ("http", "https"):
+        return io.BufferedReader(HTTPRangeFile(str(uri), block_size), buffer_size=1 << 20)
+    fs, path = _fsspec_filesystem(uri)
+    return fs.open(path, "rb", block_size=block_size)
+
+
+def stat_uri(uri) -> tuple[int, float | None]:
+    """(size in bytes, modification time or None if unknown) of a local path or URI."""
+    scheme = uri_scheme(uri)
+    if scheme == "file":
+        stat = os.stat(local_path(uri))
+        return stat.st_size, stat.st_mtime
+    if scheme in ("http", "https"):
+        response = _request("HEAD", str(uri))
+        last_modified = response.headers.get("Last-Modified")
+        mtime = parsedate_to_datetime(last_modified).timestamp() if last_modified else None
+        content_length = response.headers.get("Content-Length")
+        if content_length is None:
+            raise OSError(f"{uri} did not report a Content-Length, so its size is unknown")
+        return int(content_length), mtime
+    fs, path = _fsspec_filesystem(uri)
+    info = fs.info(path)
+    mtime = info.get("mtime") or info.get("LastModified") or info.get("last_modified")
+    if hasattr(mtime, "timestamp"):
+        mtime = mtime.timestamp()
+    return info["size"], mtime
@@ -0,0 +1,284 @@
+import hashlib
+import io
+import queue
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from warcio.archiveiterator import ArchiveIterator
+from xopen import xopen
+
+from cs336_data.uri_io import is_local, open_uri
+
+
+def index_warc_chunks(input_path, records_per_chunk: int = 1000) -> list[tuple[int, int | None]]:
+    """
+    Split a WARC file into chunks of consecutive records.
+
+    Each chunk is described by the byte offset of its first record and the
+    byte offset of the first record of the next chunk (None for the last chunk).
+    For `.warc.gz` files every record is its own gzip member, so these offsets
+    are member boundaries and a reader can seek straight to them.
+
+    Indexing reads the whole file, so files behind a remote URI (see
+    `open_uri`) are not indexed but returned as a single chunk, to be streamed
+    once.
+
+    Args:
+        input_path: Path or URI of a (optionally gzip-compressed) WARC file.
+        records_per_chunk (int): Number of records per chunk.
+
+    Returns:
+        list[tuple[int, int | None]]: (start_offset, end_offset) per chunk.
+    """
+    if not is_local(input_path):
+        return [(0, None)]
+    offsets = []
+    with open_uri(input_path) as stream:
+        iterator = ArchiveIterator(stream, no_record_parse=True)
+        for _ in iterator:
+            # `offset` points at the start of the record being yielded
+            offsets.append(iterator.offset)
+
+    starts = offsets[::records_per_chunk]
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+def iter_warc_records(input_path, start_offset: int = 0, end_offset: int | None = None):
+    """
+    Iterate over the records of a WARC file between two record offsets.
+
+    Args:
+        input_path: Path or URI of a (optionally gzip-compressed) WARC file.
+        start_offset (int): Offset of the first record to read.
+        end_offset (int | None): Offset at which to stop (exclusive), or None
+            to read until the end of the file.
+
+    Yields:
+        (int, ArcWarcRecord): The record offset and the record itself. The
+        record is only valid until the next one is requested.
+    """
+    with open_uri(input_path) as stream:
+        stream.seek(start_offset)
+        iterator = ArchiveIterator(stream)
+        for record in iterator:
+            offset = iterator.offset
+            if end_offset is not None and offset >= end_offset:
+                break
+            yield offset, record
+
+
+HTML_MIME_TYPES = ("text/html", "application/xhtml+xml")
+
+
+def _mime_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def header_skip_reason(record, max_content_length: int | None = None, content_languages=None) -> str | None:
+    """
+    Decide from WARC and HTTP headers alone whether a record can be skipped,
+    so that its payload never has to be read or decoded.
+
+    Args:
+        record: A warcio record whose content has not been read yet.
+        max_content_length (int | None): Skip records whose WARC Content-Length exceeds this.
+        content_languages: If given, skip records whose `WARC-Identified-Content-Language`
+            (Common Crawl's ISO 639-3 codes, e.g. "eng,fra") lists none of these languages.
+            Records without that header are kept.
+
+    Returns:
+        str | None: The skip reason, or None if the record should be processed.
+    """
+    if record.rec_type != "response":
+        return "not_response"
+
+    payload_type = record.rec_headers.get_header("WARC-Identified-Payload-Type")
+    if payload_type and _mime_type(payload_type) not in HTML_MIME_TYPES:
+        return "payload_type"
+
+    if record.http_headers is None:
+        return "no_http_headers"
+    if record.http_headers.get_statuscode() != "200":
+        return "http_status"
+    content_type = record.http_headers.get_header("Content-Type")
+    if content_type and _mime_type(content_type) not in HTML_MIME_TYPES:
+        return "content_type"
+
+    if max_content_length is not None:
+        content_length = record.rec_headers.get_header("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > max_content_length:
+            return "content_length"
+
+    if content_languages:
+        languages = record.rec_headers.get_header("WARC-Identified-Content-Language")
+        if languages and not set(languages.split(",")) & set(content_languages):
+            return "content_language"
+
+    return None
+
+
+def sample_fraction(key: str, seed: int = 0) -> float:
+    """
+    A number in [0, 1) that depends only on `key` and `seed`: the first 8 bytes
+    of the key's blake2b digest as a fraction of 2**64.
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8, key=seed.to_bytes(8, "little")).digest()
+    return int.from_bytes(digest, "little") / 2**64
+
+
+def in_sample(record, sample_rate: float, seed: int = 0) -> bool:
+    """
+    Whether `record` belongs to the deterministic sample of `sample_rate` of all
+    records, decided by hashing its WARC-Target-URI (its WARC-Record-ID if it has
+    none). The same records are drawn on every run and from any chunking of the
+    file; a different `seed` draws a different sample.
+    """
+    key = record.rec_headers.get_header("WARC-Target-URI") or record.rec_headers.get_header("WARC-Record-ID") or ""
+    return sample_fraction(key, seed) < sample_rate
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw stream over the bytes [start, end) of a file (end None: to the end of the file)."""
+    def __init__(self, fileobj, start: int = 0, end: int | None = None):
+        self._file = fileobj
+        self._file.seek(start)
+        self._remaining = None if end is None else end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        if size <= 0:
+            return 0
+        n = self._file.readinto(memoryview(buffer)[:size])
+        if self._remaining is not None:
+            self._remaining -= n
+        return n
+
+
+@contextmanager
+def open_warc_range(input_path, start_offset: int = 0, end_offset: int | None = None):
+    """
+    Open the records in [start_offset, end_offset) of a WARC file as a stream of
+    uncompressed WARC bytes.
+
+    Gzipped WARCs are decompressed with xopen, which uses isal or zlib-ng when
+    installed (both are several times faster than zlib) and falls back to the
+    standard gzip module. The offsets must be record (gzip member) boundaries,
+    e.g. from `index_warc_chunks`. `input_path` may be any URI `open_uri` supports.
+    """
+    with open_uri(input_path) as raw:
+        stream = io.BufferedReader(_RangeReader(raw, start_offset, end_offset), buffer_size=1 << 20)
+        with xopen(stream, "rb", threads=0) as decompressed:
+            yield decompressed
+
+
+class RecordPayload(NamedTuple):
+    """
+    A WARC record reduced to what filtering needs, detached from the WARC stream.
+
+    `payload` is None for records with a `skip_reason` (see `header_skip_reason`,
+    plus "payload_size" for payloads over the size limit and "not_sampled" for
+    records outside the sample).
+    """
+    url: str | None
+    content_type: str | None
+    payload: bytes | None
+    skip_reason: str | None
+
+
+def read_record_payloads(input_path, start_offset: int = 0, end_offset: int | None = None,
+                         max_content_length: int | None = None, content_languages=None,
+                         max_payload_bytes: int | None = None, sample_rate: float | None = None,
+                         sample_seed: int = 0):
+    """
+    Read the records in [start_offset, end_offset) of a WARC file, skipping the
+    payload of records `header_skip_reason` rules out.
+
+    Args:
+        max_content_length, content_languages: See `header_skip_reason`.
+        max_payload_bytes (int | None): Skip payloads larger than this; at most
+            this many bytes plus one are read.
+        sample_rate (float | None): Only process the fraction of records drawn by
+            `in_sample` with `sample_seed`; the others are skipped before their
+            headers are checked.
+
+    Yields:
+        RecordPayload: One per record, in file order.
+    """
+    with open_warc_range(input_path, start_offset, end_offset) as stream:
+        for record in ArchiveIterator(stream):
+            url = record.rec_headers.get_header("WARC-Target-URI")
+            if sample_rate is not None and not in_sample(record, sample_rate, sample_seed):
+                yield RecordPayload(url, None, None, "not_sampled")
+                continue
+            skip_reason = header_skip_reason(record, max_content_length, content_languages)
+            if skip_reason is not None:
+                yield RecordPayload(url, None, None, skip_reason)
+                continue
+            content_type = record.http_headers.get_header("Content-Type")
+            payload = record.content_stream().read(None if max_payload_bytes is None else max_payload_bytes + 1)
+            if max_payload_bytes is not None and len(payload) > max_payload_bytes:
+                yield RecordPayload(url, content_type, None, "payload_size")
+            else:
+                yield RecordPayload(url, content_type, payload, None)
+
+
+def prefetch(iterable, max_queued: int = 256):
+    """
+    Iterate over `iterable` in a background thread, handing items over through a
+    queue of at most `max_queued` items, so that reading and decompression (which
+    release the GIL while doing I/O and inflating) overlap with the consumer's work.
+    Exceptions of the producer are re-raised in the consumer. If the consumer
+    stops early, the producer stops too. With `max_queued` <= 0 this is a plain
+    iteration on the calling thread.
+    """
+    if max_queued <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+    end = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="warc-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -31,4 +31,5 @@ setup(
     packages=find_packages(exclude=["tests", ".github"]),
     install_requires=read_requirements("requirements.txt"),
     extras_require={"test": read_requirements("requirements-test.txt")},
+    entry_points={"console_scripts": ["cs336-data=cs336_data.cli:main"]},
 )
@@ -1,4 +1,73 @@
 #!/usr/bin/env python3
+import functools
+import http.server
+import io
+import os
 import pathlib
+import re
+import threading
+from contextlib import contextmanager
+
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
 
 FIXTURES_PATH = (pathlib.Path(__file__).resolve().parent) / "fixtures"
+
+
+def write_test_warc(path, pages, gzip=True):
+    """
+    Write a small WARC file with one `response` record per (url, html) page.
+    A page may also be (url, html, status, content_type) to write e.g. a
+    "404 Not Found" or "image/png" response.
+
+    Returns:
+        The path of the written file.
+    """
+    with open(path, "wb") as f:
+        writer = WARCWriter(f, gzip=gzip)
+        for url, html, *response in pages:
+            status, content_type = response or ("200 OK", "text/html; charset=utf-8")
+            payload = html.encode("utf-8") if isinstance(html, str) else html
+            http_headers = StatusAndHeaders(status, [("Content-Type", content_type)], protocol="HTTP/1.1")
+            record = writer.create_warc_record(
+                url, "response", payload=io.BytesIO(payload), http_headers=http_headers
+            )
+            writer.write_record(record)
+    return path
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler with single-range `Range: bytes=a-b` support, like an object store."""
+    def send_head(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match is None:
+            return super().send_head()
+        path = self.translate_path(self.path)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            f.seek(start)
+            body = f.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(path):
+    """Serve `path` over HTTP on localhost with range requests; yields the base URL."""
+    handler = functools.partial(RangeRequestHandler, directory=str(path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
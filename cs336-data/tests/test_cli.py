@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cs336_data.cli import build_parser, load_options, main, make_config
+from cs336_data.fliter_mul_process import FilterConfig
+from cs336_data.tokenize_data import tokenize_parquets
+
+logger = logging.getLogger(__name__)
+
+
+def test_flags_override_config_file(tmp_path):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"filter": {"num_workers": 4, "batch_size": 16, "output_dir": "out"}}))
+    args = build_parser().parse_args(["filter", "a.warc.gz", "--config", str(config_path), "--batch-size", "128"])
+    options = load_options(args, "filter")
+    assert options == {"inputs": ["a.warc.gz"], "num_workers": 4, "batch_size": 128, "output_dir": "out"}
+
+
+def test_filter_thresholds_from_flags_and_config(tmp_path):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"filter": {"output_dir": "out", "gopher_min_words": 20, "nsfw_threshold": 0.9}}))
+    parser = build_parser()
+    args = parser.parse_args(["filter", "a.warc.gz", "--config", str(config_path), "--min-language-confidence", "0.6"])
+    options = load_options(args, "filter")
+    del options["inputs"], options["output_dir"]
+    config = make_config(FilterConfig, options, parser)
+    assert (config.gopher_min_words, config.nsfw_threshold, config.min_language_confidence) == (20, 0.9, 0.6)
+
+
+def test_unknown_config_key_is_a_usage_error(tmp_path, capsys):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"filter": {"output_dir": "out", "batch_sise": 16}}))
+    with pytest.raises(SystemExit) as exc_info:
+        main(["filter", "a.warc.gz", "--config", str(config_path)])
+    assert exc_info.value.code == 2
+    assert "unknown option: batch_sise" in capsys.readouterr().err
+
+
+def test_dedup_exact_command(tmp_path):
+    for i in range(2):
+        pd.DataFrame({
+            "url": [f"http://example.com/{i}"],
+            "language": ["en"],
+            "text": [f"shared boilerplate\nunique line {i}"],
+        }).to_parquet(tmp_path / f"part-{i}.parquet")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    main(["dedup-exact", str(tmp_path / "part-*.parquet"), "--output-dir", str(output_dir)])
+    shards = sorted(output_dir.glob("deduplicated_data-*.parquet"))
+    assert [shard.name for shard in shards] == ["deduplicated_data-00000-00000.parquet"]
+    texts = pd.concat([pd.read_parquet(shard) for shard in shards])["text"].tolist()
+    assert texts == ["unique line 0", "unique line 1"]
+
+
+class _CharTokenizer:
+    """Minimal stand-in for a Hugging Face tokenizer: one token per byte."""
+    eos_token = "\0"
+
+    def __len__(self):
+        return 256
+
+    def __call__(self, texts):
+        return {"input_ids": [list(text.encode("utf-8")) for text in texts]}
+
+
+def test_tokenize_parquets(tmp_path):
+    pd.DataFrame({"text": ["ab", "c"]}).to_parquet(tmp_path / "data.parquet")
+    output_path = tmp_path / "tokens.bin"
+    num_tokens = tokenize_parquets([tmp_path / "data.parquet"], output_path, tokenizer=_CharTokenizer(), batch_size=1)
+    assert num_tokens == 5
+    assert np.fromfile(output_path, dtype=np.uint16).tolist() == [97, 98, 0, 99, 0]
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 import logging
 
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 from xopen import xopen
 
+from cs336_data import exact_line_deduplication
+from cs336_data.exact_line_deduplication import _count_parquet, _hash_documents, deduplicate_parquets, line_hash_paths
+
 from .adapters import run_exact_line_deduplication, run_minhash_deduplication
 from .common import FIXTURES_PATH
 
@@ -131,3 +138,110 @@ def test_minhash_deduplication_fuzzy_duplicates(tmp_path):
     assert len(deduplicated_documents) == 0
     # One of the kept deduplicated documents should be kept, and the other should be removed.
     assert len(kept_duplicated_documents) == 1
+
+
+def _write_parquet_docs(path, texts, row_group_size=None):
+    pd.DataFrame({
+        "url": [f"http://example.com/{path.stem}/{i}" for i in range(len(texts))],
+        "language": "en",
+        "text": texts,
+        "score": [float(i) for i in range(len(texts))],
+    }).to_parquet(path, row_group_size=row_group_size)
+    return path
+
+
+def test_deduplicate_parquets_in_memory_and_spilled(tmp_path):
+    paths = [
+        _write_parquet_docs(tmp_path / "a.parquet", ["header\nfirst body\nfooter", "header\nsecond body"]),
+        _write_parquet_docs(tmp_path / "b.parquet", ["third body\nfooter", "unique"]),
+    ]
+    expected = ["first body", "second body", "third body", "unique"]
+    for name, kwargs in [
+        ("memory", {}),
+        ("spilled", {"spill_dir": tmp_path / "spill", "num_partitions": 4}),
+        ("rehashed", {"reuse_line_hashes": False}),
+    ]:
+        (tmp_path / name).mkdir()
+        output_paths, deduped_lines, all_lines = deduplicate_parquets(paths, tmp_path / name, **kwargs)
+        # Both small inputs roll into the same shard
+        assert [Path(path).name for path in output_paths] == ["deduplicated_data-00000-00000.parquet"]
+        assert pd.concat(map(pd.read_parquet, output_paths))["text"].tolist() == expected
+        assert (deduped_lines, all_lines) == (4, 8)
+    assert not list((tmp_path / "spill").iterdir())
+
+
+def test_deduplicate_parquets_same_output_for_any_num_workers(tmp_path, monkeypatch):
+    paths = [
+        _write_parquet_docs(tmp_path / f"in-{i}.parquet", [
+            f"shared header\nfile {i} doc {j}\nline {(i * 7 + j) % 5}" for j in range(10)
+        ], row_group_size=4)
+        for i in range(6)
+    ]
+    spill_file_counts = []
+    count_partitions = exact_line_deduplication.count_partitions
+
+    def counting_partitions(spill_dir, *args):
+        spill_file_counts.append(len(list(Path(spill_dir).rglob("part-*.u64"))))
+        return count_partitions(spill_dir, *args)
+
+    monkeypatch.setattr(exact_line_deduplication, "count_partitions", counting_partitions)
+    for mode, kwargs in [("memory", {}), ("spilled", {"spill_dir": tmp_path / "spill", "num_partitions": 4})]:
+        results = {}
+        for num_workers in (1, 2):
+            output_dir = tmp_path / f"{mode}-{num_workers}"
+            output_paths, deduped_lines, all_lines = deduplicate_parquets(
+                paths, output_dir, num_workers=num_workers, **kwargs
+            )
+            output = pd.concat(map(pd.read_parquet, output_paths), ignore_index=True)
+            results[num_workers] = ([Path(path).name for path in output_paths], output, deduped_lines, all_lines)
+        assert results[1][0] == results[2][0]
+        pd.testing.assert_frame_equal(results[1][1], results[2][1])
+        assert results[1][2:] == results[2][2:]
+    # One spiller per worker process: at most num_workers * num_partitions files, not per input
+    assert spill_file_counts[0] <= 4 and spill_file_counts[1] <= 8
+
+
+def test_line_hash_sidecars_are_appended_per_batch(tmp_path):
+    texts = [f"header\ndoc {i}\n" + "line\n" * (i % 3) for i in range(50)]
+    path = _write_parquet_docs(tmp_path / "docs.parquet", texts, row_group_size=7)
+    hash_paths = line_hash_paths(tmp_path, 0)
+    _, line_cnt = _count_parquet(path, hash_paths)
+    hashes, offsets = _hash_documents(texts)
+    assert line_cnt == len(hashes)
+    assert np.array_equal(np.fromfile(hash_paths[0], dtype="<u8"), hashes)
+    assert np.array_equal(np.fromfile(hash_paths[1], dtype="<i8"), offsets)
+
+    # Inputs without a single line leave an empty hash file, which cannot be memory-mapped
+    empty = _write_parquet_docs(tmp_path / "empty.parquet", ["", ""])
+    output_paths, deduped_lines, all_lines = deduplicate_parquets([empty, path], tmp_path / "out")
+    assert pd.concat(map(pd.read_parquet, output_paths))["text"].tolist()[:3] == ["", "", "doc 0"]
+    # Every "header" and "line" line is a duplicate
+    assert (deduped_lines, all_lines) == (50 + 49, len(hashes))
+
+
+def test_deduplicate_parquets_groups_small_inputs(tmp_path):
+    paths = [_write_parquet_docs(tmp_path / f"in-{i}.parquet", [f"doc {i}"]) for i in range(5)]
+    paths.insert(2, _write_parquet_docs(tmp_path / "no-rows.parquet", []))
+    sizes = [path.stat().st_size for path in paths]
+    # Room for about two inputs per shard; the input without rows writes no shard of its own
+    output_paths, _, _ = deduplicate_parquets(paths, tmp_path / "out", target_shard_bytes=sizes[0] * 2)
+    assert [Path(path).name for path in output_paths] == [
+        "deduplicated_data-00000-00000.parquet",
+        "deduplicated_data-00001-00000.parquet",
+        "deduplicated_data-00002-00000.parquet",
+    ]
+    assert pd.concat(map(pd.read_parquet, output_paths))["text"].tolist() == [f"doc {i}" for i in range(5)]
+    assert [len(pd.read_parquet(path)) for path in output_paths] == [2, 2, 1]
+
+
+def test_deduplicate_parquets_streams_row_groups_into_shards(tmp_path):
+    texts = [f"boilerplate\ndocument {i}\n" + "filler " * 50 + str(i) for i in range(200)]
+    path = _write_parquet_docs(tmp_path / "docs.parquet", texts, row_group_size=20)
+    output_paths, deduped_lines, _ = deduplicate_parquets([path], tmp_path, target_shard_bytes=4096)
+    assert len(output_paths) > 1
+    assert deduped_lines == 200
+
+    output = pd.concat(map(pd.read_parquet, output_paths), ignore_index=True)
+    assert list(output.columns) == ["url", "language", "text", "score"]
+    assert output["score"].tolist() == [float(i) for i in range(200)]
+    assert output["text"][3] == "document 3\n" + "filler " * 50 + "3"
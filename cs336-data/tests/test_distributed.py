@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from cs336_data.distributed import LeaseDirectory, run_worker, shard_id
+
+logger = logging.getLogger(__name__)
+
+
+def test_leases_are_exclusive_and_expire(tmp_path):
+    first = LeaseDirectory(tmp_path, lease_seconds=60, owner="first")
+    second = LeaseDirectory(tmp_path, lease_seconds=60, owner="second")
+
+    lease = first.acquire("shard-0")
+    assert lease is not None
+    assert second.acquire("shard-0") is None
+
+    # The first worker stops heartbeating: its lease goes stale and is taken over
+    stale = time.time() - 120
+    os.utime(first.lease_path("shard-0"), (stale, stale))
+    assert second.acquire("shard-0") is not None
+    assert not lease.heartbeat()
+    assert lease.lost.is_set()
+    assert not first.commit("shard-0")
+
+    assert second.commit("shard-0", {"rows": 3})
+    assert first.acquire("shard-0") is None
+    assert json.loads(second.done_path("shard-0").read_text())["rows"] == 3
+
+
+def test_shard_ids_are_unique_per_uri():
+    assert shard_id("a/00001.warc.gz") != shard_id("b/00001.warc.gz")
+    assert shard_id("a/00001.warc.gz") == shard_id("./a//00001.warc.gz")
+    assert shard_id("a/00001.warc.gz").startswith("00001.warc-")
+    assert shard_id("s3://bucket/a/00001.warc.gz") != shard_id("s3://bucket/b/00001.warc.gz")
+
+
+def _write_shard(uri, staging_dir):
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    output = staging_dir / f"{os.path.basename(uri)}.out"
+    output.write_text(f"{uri} {os.getpid()}")
+    time.sleep(0.05)
+    return [output]
+
+
+def _worker(lease_dir, output_dir):
+    run_worker(lease_dir, output_dir, process_shard=_write_shard, poll_seconds=0.05, lease_seconds=30)
+
+
+def test_workers_split_shards(tmp_path):
+    lease_dir, output_dir = tmp_path / "leases", tmp_path / "out"
+    uris = [f"/data/shard-{i}.warc.gz" for i in range(12)]
+    leases = LeaseDirectory(lease_dir)
+    leases.plan(uris)
+    # A worker died holding shard-3 an hour ago
+    leases.lease_path(shard_id(uris[3])).write_text("dead-worker")
+    stale = time.time() - 3600
+    os.utime(leases.lease_path(shard_id(uris[3])), (stale, stale))
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_worker, args=(lease_dir, output_dir)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert leases.status() == {"done": 12, "leased": 0, "pending": 0}
+    outputs = sorted(path.name for path in output_dir.iterdir() if path.is_file())
+    assert outputs == sorted(f"{os.path.basename(uri)}.out" for uri in uris)
+    owners = {json.loads(leases.done_path(shard_id(uri)).read_text())["owner"] for uri in uris}
+    assert len(owners) > 1
+    assert not (output_dir / ".staging").exists()
+
+
+def test_worker_rechecks_lease_before_each_move(tmp_path, monkeypatch):
+    lease_dir, output_dir = tmp_path / "leases", tmp_path / "out"
+    leases = LeaseDirectory(lease_dir)
+    leases.plan(["/data/shard-0.warc.gz"])
+    real_replace = os.replace
+
+    def replace(source, destination):
+        real_replace(source, destination)
+        leases.lease_path(shard_id("/data/shard-0.warc.gz")).write_text("other-worker")
+
+    monkeypatch.setattr("cs336_data.distributed.os.replace", replace)
+
+    def process_shard(uri, staging_dir):
+        return _write_shard(uri, staging_dir) + _write_shard(uri + ".extra", staging_dir)
+
+    # The lease is taken over after the first move; the other worker finishes while we poll
+    def poll_then_finish(seconds):
+        LeaseDirectory(lease_dir, owner="other-worker").commit(shard_id("/data/shard-0.warc.gz"))
+
+    monkeypatch.setattr("cs336_data.distributed.time.sleep", poll_then_finish)
+    assert run_worker(lease_dir, output_dir, process_shard=process_shard, poll_seconds=0) == []
+    assert sorted(path.name for path in output_dir.iterdir() if path.is_file()) == ["shard-0.warc.gz.out"]
+    assert json.loads(leases.done_path(shard_id("/data/shard-0.warc.gz")).read_text())["owner"] == "other-worker"
@@ -1,5 +1,16 @@
 #!/usr/bin/env python3
 import logging
+import time
+
+import pytest
+
+from cs336_data.extract_from_html import (
+    DETECT_PREFIX_BYTES,
+    ExtractionSkipped,
+    extract_text_from_html_bytes,
+    extract_text_with_limits,
+    guess_encoding,
+)
 
 from .adapters import run_extract_text_from_html_bytes
 from .common import FIXTURES_PATH
@@ -15,3 +26,54 @@ def test_extract_text_from_html_bytes():
     with open(moby_expected_path) as f:
         moby_expected_text = f.read()
     assert moby_expected_text == run_extract_text_from_html_bytes(moby_bytes)
+
+
+def test_extract_text_honors_declared_charset():
+    html = "<html><body><p>Übergrößenträger café</p></body></html>"
+    payload = html.encode("cp1252")
+    assert extract_text_from_html_bytes(payload, "text/html; charset=windows-1252") == "Übergrößenträger café"
+    meta_payload = b'<html><head><meta charset="iso-8859-1"></head>' + payload[6:]
+    assert extract_text_from_html_bytes(meta_payload) == "Übergrößenträger café"
+
+
+def test_guess_encoding_uses_bounded_prefix():
+    assert guess_encoding(b"<html>" + b"a" * 100_000 + "é".encode("utf-8")) == "utf-8"
+    assert guess_encoding("<p>тест</p>".encode("utf-8"), "text/html; charset=UTF-8") == "UTF-8"
+    assert extract_text_from_html_bytes("<p>привет, мир</p>".encode("utf-8")) == "привет, мир"
+
+    # Mostly-ASCII UTF-8 without a declared charset, which detectors tend to take for a legacy code page
+    mostly_ascii = ("<html><body><p>" + "Hello world. " * 50 + "Café</p></body></html>").encode("utf-8")
+    assert guess_encoding(mostly_ascii) == "utf-8"
+    assert extract_text_from_html_bytes(mostly_ascii).endswith("Café")
+    # A multi-byte character cut off at the end of the prefix
+    cut = b"<p>" + b"a" * (DETECT_PREFIX_BYTES - 4) + "é".encode("utf-8") * 4
+    assert guess_encoding(cut) == "utf-8"
+    assert guess_encoding("<p>Übergröße café</p>".encode("cp1252")) != "utf-8"
+
+
+def test_extract_text_with_limits():
+    html = b"<html><body><p>" + b"word " * 1000 + b"</p></body></html>"
+    assert extract_text_with_limits(html, max_text_chars=10_000, timeout=10) == extract_text_from_html_bytes(html)
+    with pytest.raises(ExtractionSkipped) as e:
+        extract_text_with_limits(html, max_text_chars=100)
+    assert e.value.reason == "text_size"
+
+
+def test_timeout_interrupts_extraction():
+    # A page that takes resiliparse several seconds to parse and extract
+    html = b"<html><body>" + b"<div><p>some words here</p><span>x</span></div>" * 50_000 + b"</body></html>"
+    timeout = 0.2
+
+    # Start the extraction process, so its startup is not part of the measurement
+    assert extract_text_with_limits(b"<p>warm up</p>", timeout=10) == "warm up"
+    start = time.perf_counter()
+    with pytest.raises(ExtractionSkipped) as e:
+        extract_text_with_limits(html, timeout=timeout)
+    assert e.value.reason == "timeout"
+    assert time.perf_counter() - start < 2 * timeout
+
+    # The killed process is replaced for the next page; limits still apply in it
+    assert extract_text_with_limits(b"<p>next page</p>", timeout=10) == "next page"
+    with pytest.raises(ExtractionSkipped) as e:
+        extract_text_with_limits(b"<p>" + b"word " * 100 + b"</p>", max_text_chars=10, timeout=10)
+    assert e.value.reason == "text_size"
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import logging
+
+import numpy as np
+
+from cs336_data.filter_cascade import FilterCascade, FilterStage
+from cs336_data.fliter_mul_process import FilterConfig, default_cascade, worker_cascade
+from cs336_data.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+
+def _recording_stage(name, cost, keep, calls):
+    def predicate(text):
+        calls.append(name)
+        return keep(text), name
+    return FilterStage(name, predicate, cost=cost)
+
+
+def test_filter_cascade_short_circuits_cheapest_first():
+    calls = []
+    cascade = FilterCascade([
+        _recording_stage("expensive", 10.0, lambda text: True, calls),
+        _recording_stage("cheap", 1.0, lambda text: "good" in text, calls),
+    ], retune_every=None)
+
+    passed, rejected_by, infos = cascade("bad text")
+    assert not passed
+    assert rejected_by == "cheap"
+    assert calls == ["cheap"]
+    assert infos == {"cheap": "cheap"}
+
+    calls.clear()
+    passed, rejected_by, infos = cascade("good text")
+    assert passed
+    assert rejected_by is None
+    assert calls == ["cheap", "expensive"]
+
+
+def test_filter_cascade_retunes_by_rejection_rate():
+    calls = []
+    cascade = FilterCascade([
+        _recording_stage("rarely_rejects", 1.0, lambda text: text != "a", calls),
+        _recording_stage("often_rejects", 2.0, lambda text: text == "a", calls),
+    ], retune_every=50, min_calls=1000)
+    assert [stage.name for stage in cascade.stages] == ["rarely_rejects", "often_rejects"]
+
+    for i in range(49):
+        cascade("b")
+    # Rejects 98% vs. never: twice the cost is worth it
+    cascade("b")
+    assert [stage.name for stage in cascade.stages] == ["often_rejects", "rarely_rejects"]
+    assert cascade.stats()["often_rejects"]["rejections"] == 50
+
+
+def test_filter_cascade_run_batch_only_passes_survivors():
+    batch_calls = []
+
+    def batch_predicate(texts):
+        batch_calls.append(list(texts))
+        return np.array(["toxic" not in text for text in texts]), ["checked"] * len(texts)
+
+    cascade = FilterCascade([
+        FilterStage("length", lambda text: (len(text) > 3, len(text)), cost=1.0),
+        FilterStage("toxicity", lambda text: (True, None), cost=10.0, batch_predicate=batch_predicate),
+    ], retune_every=None)
+
+    passed, rejected_by, infos = cascade.run_batch(["ok", "fine text", "toxic text", "good text"])
+    assert passed.tolist() == [False, True, False, True]
+    assert rejected_by == ["length", None, "toxicity", None]
+    # The batched stage ran once, on the documents that survived the first stage
+    assert batch_calls == [["fine text", "toxic text", "good text"]]
+    assert infos[0] == {"length": 2}
+    assert infos[1] == {"length": 9, "toxicity": "checked"}
+    assert cascade.stats()["toxicity"]["calls"] == 3
+    assert cascade.stats()["toxicity"]["rejections"] == 1
+
+
+def test_default_cascade_uses_config_thresholds():
+    text = "a short but otherwise fine text " * 3
+    stages = {stage.name: stage for stage in default_cascade().stages}
+    assert not stages["gopher"](text)[0]
+    relaxed = FilterConfig(gopher_min_words=5)
+    relaxed_stages = {stage.name: stage for stage in default_cascade(relaxed).stages}
+    assert relaxed_stages["gopher"](text)[0]
+    assert relaxed_stages["gopher"].cache_key != stages["gopher"].cache_key
+    assert relaxed_stages["language"].cache_key == stages["language"].cache_key
+    assert worker_cascade(relaxed) is worker_cascade(FilterConfig(gopher_min_words=5))
+    assert worker_cascade(relaxed) is not worker_cascade()
+
+
+def test_cached_results_are_keyed_by_stage_cache_key():
+    cache = ResultCache(max_entries=10)
+    strict = FilterCascade([FilterStage("length", lambda text: (len(text) < 3, None), cache_key="length:3")])
+    loose = FilterCascade([FilterStage("length", lambda text: (len(text) < 10, None), cache_key="length:10")])
+    assert not strict.run_batch(["hello"], cache=cache)[0][0]
+    assert loose.run_batch(["hello"], cache=cache)[0][0]
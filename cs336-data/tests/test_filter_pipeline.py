@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import json
+import logging
+
+import pyarrow.parquet as pq
+
+from cs336_data.filter_cascade import FilterCascade, FilterStage
+from cs336_data.fliter_mul_process import (
+    FilterConfig, gopher_batch_stage, gopher_stage, process_warc_chunk, run_filter,
+)
+from cs336_data.manifest import ShardManifest
+from cs336_data.parquet_io import parquet_sample_rate
+from cs336_data.warc_reader import index_warc_chunks, sample_fraction
+
+from .common import write_test_warc
+
+logger = logging.getLogger(__name__)
+
+GOOD_TEXT = "The quick brown fox jumps over the lazy dog near the quiet river bank. " * 8
+
+
+def _gopher_cascade():
+    # Module-level predicates, so the cascade can be pickled into chunk jobs
+    return FilterCascade([FilterStage("gopher", gopher_stage, batch_predicate=gopher_batch_stage)])
+
+
+def _write_shards(tmp_path, num_shards=2, pages_per_shard=10):
+    """WARC shards in which every third page is too short for Gopher and one record is a PDF."""
+    paths, expected = [], {}
+    for s in range(num_shards):
+        pages = []
+        for i in range(pages_per_shard):
+            url = f"http://example.com/{s}/{i}"
+            if i % 3 == 0:
+                pages.append((url, "<html><body><p>Too short.</p></body></html>"))
+            else:
+                pages.append((url, f"<html><body><p>{GOOD_TEXT} Mail page{i}@example.com.</p></body></html>"))
+                expected[url] = f"{GOOD_TEXT}Mail |||EMAIL_ADDRESS|||."
+        pages.append((f"http://example.com/{s}/doc.pdf", b"%PDF-1.4", "200 OK", "application/pdf"))
+        paths.append(str(write_test_warc(tmp_path / f"s{s}.warc.gz", pages)))
+    return paths, expected
+
+
+def _read_rows(output_files):
+    rows = {}
+    for path in output_files:
+        for row in pq.read_table(path).to_pylist():
+            assert row["url"] not in rows
+            rows[row["url"]] = row["text"].strip()
+    return rows
+
+
+def test_run_filter_end_to_end_and_resume(tmp_path):
+    warc_paths, expected = _write_shards(tmp_path)
+    output_dir = tmp_path / "out"
+    config = FilterConfig(records_per_chunk=3, row_group_size=4, batch_size=2)
+    output_files = run_filter(warc_paths, output_dir, num_workers=2, cascade=_gopher_cascade(), config=config)
+    # In the order the shards finished
+    assert sorted(output_files) == [str(output_dir / "s0.warc.parquet"), str(output_dir / "s1.warc.parquet")]
+    assert _read_rows(output_files) == expected
+    assert all(parquet_sample_rate(path) == 1.0 for path in output_files)
+    assert not list(output_dir.glob("*.parts"))
+
+    stats = json.loads((output_dir / "stats.json").read_text())
+    assert stats["sample_rate"] == 1.0
+    assert stats["documents"] == 20
+    assert stats["kept"] == len(expected) == 12
+    assert stats["rejected_by"] == {"gopher": 8}
+    assert stats["gopher_rules"] == {"word_count": 8}
+    assert sum(stats["skipped"].values()) == 2
+    shard_stats = json.loads((output_dir / "s0.warc.stats.json").read_text())
+    assert (shard_stats["rows"], shard_stats["kept"]) == (6, 6)
+
+    # A second run finds every shard done in its manifest and rewrites nothing
+    mtimes = [(output_dir / name).stat().st_mtime_ns for name in ("s0.warc.parquet", "s1.warc.parquet")]
+    resumed_files = run_filter(warc_paths, output_dir, num_workers=2, cascade=_gopher_cascade(), config=config)
+    assert sorted(resumed_files) == sorted(output_files)
+    assert [(output_dir / name).stat().st_mtime_ns for name in ("s0.warc.parquet", "s1.warc.parquet")] == mtimes
+    assert _read_rows(output_files) == expected
+    assert json.loads((output_dir / "stats.json").read_text()) == stats
+    profile = json.loads((output_dir / "profile.json").read_text())
+    assert "warc_read" not in profile["stages"]
+
+
+def test_run_filter_resumes_interrupted_shard(tmp_path):
+    warc_paths, expected = _write_shards(tmp_path, num_shards=1)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    config = FilterConfig(records_per_chunk=3, row_group_size=4)
+
+    # A run that stopped after committing the first chunk of the shard
+    output_path = output_dir / "s0.warc.parquet"
+    manifest = ShardManifest.load_or_create(output_dir / "s0.warc.manifest.json", warc_paths[0], str(output_path))
+    chunks = index_warc_chunks(warc_paths[0], config.records_per_chunk)
+    parts_dir = output_dir / "s0.warc.parquet.parts"
+    parts_dir.mkdir()
+    manifest.set_chunks(chunks, [parts_dir / f"part-{start:015d}.parquet" for start, _ in chunks])
+    chunk = manifest.chunks[0]
+    _, chunk_stats = process_warc_chunk(
+        warc_paths[0], chunk["part"], chunk["start"], chunk["end"], _gopher_cascade(), config
+    )
+    chunk_stats.pop("profile")
+    manifest.commit_chunk(0, chunk_stats)
+    manifest.save()
+
+    output_files = run_filter(warc_paths, output_dir, num_workers=2, cascade=_gopher_cascade(), config=config)
+    assert _read_rows(output_files) == expected
+    stats = json.loads((output_dir / "stats.json").read_text())
+    assert (stats["documents"], stats["kept"]) == (10, 6)
+    # Only the chunks that were not committed are read again
+    profile = json.loads((output_dir / "profile.json").read_text())
+    assert profile["stages"]["warc_read"]["records_in"] == 11 - chunk_stats["records"]
+
+
+def test_run_filter_tags_sampled_outputs(tmp_path):
+    warc_paths, expected = _write_shards(tmp_path)
+    output_dir = tmp_path / "out"
+    config = FilterConfig(records_per_chunk=3, sample_rate=0.5, sample_seed=1)
+    output_files = run_filter(warc_paths, output_dir, num_workers=2, cascade=_gopher_cascade(), config=config)
+    assert all(parquet_sample_rate(path) == 0.5 for path in output_files)
+    assert json.loads((output_dir / "stats.json").read_text())["sample_rate"] == 0.5
+    assert json.loads((output_dir / "s1.warc.stats.json").read_text())["sample_rate"] == 0.5
+    sampled = {url: text for url, text in expected.items() if sample_fraction(url, 1) < 0.5}
+    assert _read_rows(output_files) == sampled
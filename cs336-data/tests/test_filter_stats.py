@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import logging
+
+import numpy as np
+
+from cs336_data.detect_low_quality_crawl import gopher_fail_rule, gopher_quality_filter
+from cs336_data.filter_stats import FilterStats
+
+logger = logging.getLogger(__name__)
+
+
+def test_gopher_fail_rule():
+    _, diagnostics = gopher_quality_filter("too short")
+    assert gopher_fail_rule(diagnostics["fail_reason"]) == "word_count"
+    assert gopher_fail_rule(None) is None
+
+
+def test_filter_stats_tallies_and_merges():
+    stats = FilterStats()
+    stats.records = 5
+    stats.skip("http_status")
+    stats.add_batch(
+        np.array([True, False, False, False]),
+        [None, "gopher", "language", "nsfw"],
+        [
+            {"gopher": {"fail_reason": None}, "language": ("en", 0.95), "nsfw": ("non-nsfw", 0.99)},
+            {"gopher": {"fail_reason": "Too few alphabetic words (12.00%)"}},
+            {"gopher": {"fail_reason": None}, "language": ("fr", 0.42)},
+            {"gopher": {"fail_reason": None}, "language": ("en", 0.91), "nsfw": ("nsfw", 0.7)},
+        ],
+    )
+    data = stats.to_dict()
+    assert data["documents"] == 4 and data["kept"] == 1
+    assert data["rejected_by"] == {"gopher": 1, "language": 1, "nsfw": 1}
+    assert data["gopher_rules"] == {"alpha_word_ratio": 1}
+    assert data["languages"] == {"en": 2, "fr": 1}
+    assert data["confidence"]["language"][4] == 1
+    assert data["confidence"]["language"][9] == 2
+    assert sum(data["confidence"]["nsfw"]) == 2
+
+    total = FilterStats.from_dict(data)
+    total.merge(stats)
+    merged = total.to_dict()
+    assert merged["records"] == 10
+    assert merged["skipped"] == {"http_status": 2}
+    assert merged["languages"] == {"en": 4, "fr": 2}
+    assert merged["confidence"]["language"][9] == 4
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import logging
+import random
+from collections import Counter
+
+import numpy as np
+
+from cs336_data.line_hashes import MAX_COUNT, HashSpiller, LineHashCounter, count_partitions, hash_lines
+
+logger = logging.getLogger(__name__)
+
+
+def test_hash_lines():
+    hashes = hash_lines(["a line", "another line", "a line", ""])
+    assert hashes.dtype == np.uint64
+    assert len(hashes) == 4
+    assert hashes[0] == hashes[2]
+    assert len(set(hashes.tolist())) == 3
+    assert len(hash_lines([])) == 0
+
+
+def test_line_hash_counter_matches_counter():
+    rng = random.Random(0)
+    lines = [f"line {rng.randrange(3000)}" for _ in range(10000)]
+    expected = Counter(lines)
+
+    # A small buffer merges into the table many times
+    counter = LineHashCounter(buffer_size=1000)
+    for start in range(0, len(lines), 700):
+        counter.add(hash_lines(lines[start:start + 700]))
+    assert len(counter) == len(expected)
+    assert np.all(np.diff(counter.keys.astype(np.float64)) > 0)
+
+    queries = list(expected) + ["never seen"]
+    counts = counter.counts_of(hash_lines(queries))
+    assert counts.tolist() == [min(expected[line], MAX_COUNT) for line in expected] + [0]
+    assert counter.nbytes == 9 * len(expected)
+
+
+def test_line_hash_counter_keeps_few_runs():
+    hashes = np.random.default_rng(0).integers(0, 2**63, size=64_000, dtype=np.uint64)
+    counter = LineHashCounter(buffer_size=1000)
+    for start in range(0, len(hashes), 1000):
+        counter.add(hashes[start:start + 1000])
+        # Size-tiered runs: at most one per power of two of the table size
+        assert len(counter._runs) <= int(np.log2(start // 1000 + 1)) + 1
+    counter.add(hashes[:10])
+    assert len(counter) == len(hashes)
+    assert counter.counts_of(hashes[:20]).tolist() == [2] * 10 + [1] * 10
+
+
+def test_line_hash_counter_merge():
+    first, second = LineHashCounter(), LineHashCounter()
+    first.add(hash_lines(["a", "b", "b"]))
+    second.add(hash_lines(["b", "c"]))
+    first.merge(second)
+    assert first.counts_of(hash_lines(["a", "b", "c", "d"])).tolist() == [1, 2, 1, 0]
+    assert LineHashCounter().counts_of(hash_lines(["a"])).tolist() == [0]
+
+
+def test_spilled_partitions_match_in_memory_counts(tmp_path):
+    rng = random.Random(0)
+    lines = [f"line {rng.randrange(3000)}" for _ in range(10000)]
+    counter = LineHashCounter()
+    counter.add(hash_lines(lines))
+
+    # Two spillers (e.g. two workers) write to the same spill directory
+    for i, start in enumerate([0, 5000]):
+        spiller = HashSpiller(tmp_path / f"worker-{i}", num_partitions=16, buffer_size=1000)
+        for block_start in range(start, start + 5000, 700):
+            spiller.add(hash_lines(lines[block_start:min(block_start + 700, start + 5000)]))
+        spiller.flush()
+    assert len(list(tmp_path.rglob("part-*.u64"))) == 32
+
+    duplicates = count_partitions(tmp_path, num_partitions=16, num_workers=2)
+    assert np.array_equal(duplicates.hashes, counter.duplicates().hashes)
+    assert not list(tmp_path.rglob("part-*.u64"))
+
+    queries = hash_lines(["line 1", "never seen"] + lines[:100])
+    assert np.array_equal(duplicates.contains(queries), counter.counts_of(queries) > 1)
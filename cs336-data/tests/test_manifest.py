@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import logging
+import os
+
+from cs336_data.manifest import ShardManifest
+
+logger = logging.getLogger(__name__)
+
+
+def test_shard_manifest_tracks_committed_offset(tmp_path):
+    input_path = tmp_path / "shard.warc.gz"
+    input_path.write_bytes(b"x" * 300)
+    manifest_path = tmp_path / "shard.manifest.json"
+    parts = [tmp_path / f"part-{i}.parquet" for i in range(3)]
+
+    manifest = ShardManifest.load_or_create(manifest_path, input_path, tmp_path / "shard.parquet")
+    assert manifest.chunks is None
+    manifest.set_chunks([(0, 100), (100, 200), (200, None)], parts)
+    assert manifest.pending_chunks() == [0, 1, 2]
+
+    # Chunks finish out of order; the committed offset only covers the finished prefix
+    parts[1].touch()
+    manifest.commit_chunk(1, {"records": 10, "rows": 4, "skipped": {"http_status": 2}})
+    assert manifest.data["record_offset"] == 0
+    parts[0].touch()
+    manifest.commit_chunk(0, {"records": 10, "rows": 3, "skipped": {"http_status": 1, "content_type": 5}})
+    assert manifest.data["record_offset"] == 200
+    assert manifest.data["rows"] == 7
+    assert manifest.data["skipped"] == {"http_status": 3, "content_type": 5}
+    manifest.save()
+
+    reloaded = ShardManifest.load_or_create(manifest_path, input_path, tmp_path / "shard.parquet")
+    assert reloaded.pending_chunks() == [2]
+    assert not reloaded.done
+
+    # A committed chunk whose output went missing has to be redone
+    os.remove(parts[0])
+    assert reloaded.pending_chunks() == [0, 2]
+
+
+def test_shard_manifest_discarded_when_input_changes(tmp_path):
+    input_path = tmp_path / "shard.warc.gz"
+    input_path.write_bytes(b"x" * 300)
+    manifest_path = tmp_path / "shard.manifest.json"
+
+    manifest = ShardManifest.load_or_create(manifest_path, input_path, tmp_path / "shard.parquet")
+    manifest.set_chunks([(0, None)], [tmp_path / "part-0.parquet"])
+    manifest.save()
+
+    input_path.write_bytes(b"y" * 400)
+    manifest = ShardManifest.load_or_create(manifest_path, input_path, tmp_path / "shard.parquet")
+    assert manifest.chunks is None
+    assert manifest.data["size"] == 400
+
+
+def test_shard_manifest_discarded_when_sample_changes(tmp_path):
+    input_path = tmp_path / "shard.warc.gz"
+    input_path.write_bytes(b"x" * 300)
+    manifest_path = tmp_path / "shard.manifest.json"
+    output_path = tmp_path / "shard.parquet"
+
+    manifest = ShardManifest.load_or_create(manifest_path, input_path, output_path, sample_rate=0.01)
+    manifest.set_chunks([(0, None)], [tmp_path / "part-0.parquet"])
+    manifest.save()
+
+    assert ShardManifest.load_or_create(manifest_path, input_path, output_path, sample_rate=0.01).chunks
+    assert ShardManifest.load_or_create(manifest_path, input_path, output_path, 0.01, sample_seed=1).chunks is None
+    assert ShardManifest.load_or_create(manifest_path, input_path, output_path).chunks is None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import logging
+
+import fasttext
+import numpy as np
+import pytest
+
+from cs336_data import model_registry
+from cs336_data.detect_harmful_info import detect_nsfw, detect_nsfw_batch
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def tiny_nsfw_model(tmp_path, monkeypatch):
+    train_path = tmp_path / "train.txt"
+    with open(train_path, "w") as f:
+        for i in range(50):
+            f.write(f"__label__nsfw filthy obscene words {i}\n")
+            f.write(f"__label__non-nsfw pleasant clean sentence {i}\n")
+    model = fasttext.train_supervised(str(train_path), epoch=25, thread=1, verbose=0)
+    model.save_model(str(tmp_path / model_registry.MODEL_FILES["nsfw"]))
+
+    monkeypatch.setenv(model_registry.MODEL_DIR_ENV, str(tmp_path))
+    model_registry.unload_models()
+    yield tmp_path
+    model_registry.unload_models()
+
+
+def test_model_path_resolution(tmp_path, monkeypatch):
+    monkeypatch.delenv(model_registry.MODEL_DIR_ENV, raising=False)
+    assert model_registry.model_path("language") == "./models/lid.176.bin"
+
+    monkeypatch.setenv(model_registry.MODEL_DIR_ENV, str(tmp_path))
+    assert model_registry.model_path("toxic") == str(tmp_path / model_registry.MODEL_FILES["toxic"])
+
+    monkeypatch.setenv("CS336_DATA_TOXIC_MODEL", "/elsewhere/toxic.bin")
+    assert model_registry.model_path("toxic") == "/elsewhere/toxic.bin"
+
+    with pytest.raises(ValueError):
+        model_registry.model_path("sentiment")
+
+
+def test_get_model_loads_lazily_once(tiny_nsfw_model):
+    assert "nsfw" not in model_registry._models
+    model = model_registry.get_model("nsfw")
+    assert model_registry.get_model("nsfw") is model
+
+
+def test_detect_nsfw_batch_matches_single(tiny_nsfw_model):
+    texts = ["filthy obscene words", "pleasant clean sentence", "more filthy words\nacross lines"]
+    labels, confidences = detect_nsfw_batch(texts)
+    assert isinstance(labels, np.ndarray)
+    assert isinstance(confidences, np.ndarray)
+    assert labels.tolist()[:2] == ["nsfw", "non-nsfw"]
+    for text, label, confidence in zip(texts[:2], labels, confidences):
+        single_label, single_confidence = detect_nsfw(text)
+        assert single_label == label
+        assert single_confidence == pytest.approx(confidence, rel=1e-5)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import logging
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cs336_data.parquet_io import ShardedParquetWriter, StreamingParquetWriter, parquet_sample_rate, with_sample_rate
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([("url", pa.string()), ("text", pa.string())])
+
+
+def test_streaming_parquet_writer_row_groups(tmp_path):
+    path = tmp_path / "out.parquet"
+    with StreamingParquetWriter(path, SCHEMA, row_group_size=4) as writer:
+        for i in range(10):
+            writer.write((f"http://example.com/{i}", f"text {i}"))
+        # Nothing is visible at the final path until the writer is closed
+        assert not path.exists()
+        assert writer.num_rows == 10
+
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.num_row_groups == 3
+    assert parquet_file.read().to_pylist()[9] == {"url": "http://example.com/9", "text": "text 9"}
+
+
+def test_streaming_parquet_writer_discards_on_error(tmp_path):
+    path = tmp_path / "out.parquet"
+    with pytest.raises(RuntimeError):
+        with StreamingParquetWriter(path, SCHEMA, row_group_size=2) as writer:
+            writer.write({"url": "http://example.com", "text": "text"})
+            raise RuntimeError("worker crashed")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sample_rate_metadata(tmp_path):
+    full_path, sampled_path = tmp_path / "full.parquet", tmp_path / "sampled.parquet"
+    with StreamingParquetWriter(full_path, with_sample_rate(SCHEMA, None)) as writer:
+        writer.write(("http://example.com/0", "text"))
+    with StreamingParquetWriter(sampled_path, with_sample_rate(SCHEMA, 0.01)) as writer:
+        writer.write(("http://example.com/0", "text"))
+    assert parquet_sample_rate(full_path) == 1.0
+    assert parquet_sample_rate(sampled_path) == 0.01
+
+
+def test_sharded_parquet_writer(tmp_path):
+    # Random text, so that the files do not compress below the target size
+    texts = [os.urandom(50).hex() for _ in range(100)]
+    table = pa.table({"url": [f"http://example.com/{i}" for i in range(100)], "text": texts})
+    with ShardedParquetWriter(tmp_path / "out", SCHEMA, target_bytes=8000) as writer:
+        for _ in range(5):
+            writer.write_table(table)
+    assert len(writer.paths) > 1
+    assert writer.paths[0].endswith("out-00000.parquet")
+    assert sum(pq.read_metadata(path).num_rows for path in writer.paths) == writer.num_rows == 500
+
+    with ShardedParquetWriter(tmp_path / "empty", SCHEMA) as writer:
+        pass
+    assert writer.paths == []
+    assert not list(tmp_path.glob("empty*"))
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import logging
 
+from cs336_data.remove_personal_info import PIIMasker, mask_emails, mask_ip_addresses, mask_phone_numbers
+
 from .adapters import run_mask_emails, run_mask_ips, run_mask_phone_numbers
 
 logger = logging.getLogger(__name__)
@@ -58,3 +60,20 @@ def test_mask_ips():
     masked_text, num_masked = run_mask_ips(test_string)
     assert masked_text == expected_masked_text
     assert num_masked == 1
+
+
+def test_pii_masker_single_pass_matches_sequential():
+    masker = PIIMasker()
+    test_strings = [
+        "Feel free to contact me at test@gmail.com or (283) 182 3829 if you have any questions.",
+        "The server at 192.0.2.146 is run by pl@fakedomain.ai, call +1 283-182-3829.",
+        "Nothing to see here.",
+        "Order 12 apples, 3 pears and |||EMAIL_ADDRESS||| stays as is.",
+    ]
+    for test_string in test_strings:
+        expected, num_emails = mask_emails(test_string)
+        expected, num_phones = mask_phone_numbers(expected)
+        expected, num_ips = mask_ip_addresses(expected)
+        masked_text, counts = masker.mask(test_string)
+        assert masked_text == expected
+        assert counts == {"email": num_emails, "phone": num_phones, "ip": num_ips}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+
+from cs336_data.filter_cascade import FilterCascade, FilterStage
+from cs336_data.profiling import PipelineProfiler
+
+logger = logging.getLogger(__name__)
+
+
+def test_profiler_counts_and_merges(tmp_path):
+    worker = PipelineProfiler()
+    worker.note("read", "prefetched")
+    items = list(worker.iterate("read", [b"a", b"bb", b"ccc"]))
+    assert items == [b"a", b"bb", b"ccc"]
+    with worker.stage("extract") as stats:
+        stats.records_in += 3
+        stats.records_out += 2
+        stats.bytes_in += 6
+    assert worker.stats("read").records_in == 3
+    assert worker.stats("extract").wall_seconds >= 0
+
+    total = PipelineProfiler()
+    total.merge(worker.to_dict())
+    total.merge(worker)
+    assert total.stats("read").records_in == 6
+    assert total.stats("extract").records_out == 4
+
+    path = tmp_path / "profile.json"
+    total.write_json(path, num_workers=2)
+    data = json.loads(path.read_text())
+    assert data["num_workers"] == 2
+    assert data["stages"]["extract"]["bytes_in"] == 12
+    assert data["stages"]["read"]["note"] == "prefetched"
+    assert "note" not in data["stages"]["extract"]
+
+
+def test_profiler_cpu_time_excludes_other_threads():
+    profiler = PipelineProfiler()
+
+    def spin():
+        end = time.perf_counter() + 0.3
+        while time.perf_counter() < end:
+            pass
+
+    with profiler.stage("wait"):
+        thread = threading.Thread(target=spin)
+        thread.start()
+        thread.join()
+    assert profiler.stats("wait").wall_seconds >= 0.3
+    assert profiler.stats("wait").cpu_seconds < 0.1
+
+
+def test_cascade_reports_stages_to_profiler():
+    stages = [
+        FilterStage("short", lambda text: (len(text) < 10, None), cost=1),
+        FilterStage("vowel", lambda text: (text[:1] in "aeiou", None), cost=2),
+    ]
+    profiler = PipelineProfiler()
+    passed, _, _ = FilterCascade(stages).run_batch(["apple", "banana", "a very long text"], profiler=profiler)
+    assert np.array_equal(passed, [True, False, False])
+    assert (profiler.stats("short").records_in, profiler.stats("short").records_out) == (3, 2)
+    assert (profiler.stats("vowel").records_in, profiler.stats("vowel").records_out) == (2, 1)
+    assert profiler.stats("vowel").bytes_in == len("apple") + len("banana")
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 import logging
 
+import pytest
+
+from cs336_data.detect_low_quality_crawl import gopher_quality_filter, gopher_quality_filter_batch
+
 from .adapters import run_classify_quality, run_gopher_quality_filter
 from .common import FIXTURES_PATH
 
@@ -53,6 +57,13 @@ def test_gopher_more_than_100000_non_symbol_words():
     assert run_gopher_quality_filter(text)
 
 
+def test_gopher_stops_counting_past_max_words():
+    text = "The string you are reading is too long of a text. " * 50000
+    passed, diagnostics = gopher_quality_filter(text, max_words=1000)
+    assert not passed
+    assert diagnostics == {"num_words": 1001, "fail_reason": "Word count out of range [50, 1000]"}
+
+
 def test_gopher_average_word_length_less_than_3():
     text = "the be " * 100
     assert not run_gopher_quality_filter(text)
@@ -93,3 +104,49 @@ def test_gopher_less_than_80_percent_words_with_alphabetic_character():
     words += ["word" for _ in range(2)]
     text = "the and " + " ".join(words)
     assert not run_gopher_quality_filter(text)
+
+
+def test_gopher_batch_matches_single_document_filter():
+    texts = [
+        "This should definitely be a valid input text and of high quality according to Gopher rules. " * 100,
+        "The string you are reading is a short snippet of text.",
+        "The string you are reading is too long of a text. " * 50000,
+        "the be " * 100,
+        "the and " + "extraordinarily extraordinarily extraordinarily longesest " * 100,
+        "\n".join(["The line here is an example of line ending with an ellipsis..."] * 70 + ["This is a normal line."] * 30),
+        "\r\n".join(["The line here is an example of ending with ellipsis...   "] * 30 + ["  This is a normal line.", "  "] * 230),
+        "the and " + " ".join(["123"] * 8 + ["word"] * 2),
+        "Ceci est un texte français avec des caractères accentués, écrit à Zürich. " * 20,
+        "",
+    ]
+    mask, diagnostics = gopher_quality_filter_batch(texts)
+    diagnostics = diagnostics.to_pylist()
+    for text, passed, batch_diagnostics in zip(texts, mask, diagnostics):
+        expected_passed, expected_diagnostics = gopher_quality_filter(text)
+        assert passed == expected_passed
+        # The batch version computes every metric; the ones the single-document filter got to must agree
+        for key, value in expected_diagnostics.items():
+            assert batch_diagnostics[key] == pytest.approx(value)
+
+
+def test_gopher_batch_bounds_long_texts():
+    texts = [
+        "word " * 1000,
+        "extraordinarily " * 90,
+        "short text " * 30,
+    ]
+    mask, diagnostics = gopher_quality_filter_batch(texts, min_words=10, max_words=100)
+    diagnostics = diagnostics.to_pylist()
+    assert list(mask) == [False, False, True]
+    # Routed through the bounded scan, which stops one word past the limit
+    assert diagnostics[0]["num_words"] == 101
+    assert diagnostics[0]["mean_word_len"] != diagnostics[0]["mean_word_len"]
+    # Long in characters but within the word limit: every rule up to the failing one is checked
+    assert diagnostics[1]["num_words"] == 90
+    assert diagnostics[1]["fail_reason"].startswith("Mean word length")
+    assert diagnostics[2]["num_words"] == 60
+    for text, passed, batch_diagnostics in zip(texts, mask, diagnostics):
+        expected_passed, expected_diagnostics = gopher_quality_filter(text, min_words=10, max_words=100)
+        assert passed == expected_passed
+        for key, value in expected_diagnostics.items():
+            assert batch_diagnostics[key] == pytest.approx(value)
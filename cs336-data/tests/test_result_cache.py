@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import logging
+import time
+
+from cs336_data.filter_cascade import FilterCascade, FilterStage
+from cs336_data.result_cache import ResultCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+
+def test_result_cache_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("extract", content_hash(b"a"), "A")
+    cache.put("extract", content_hash(b"b"), "B")
+    assert cache.get("extract", content_hash(b"a")) == "A"
+    cache.put("extract", content_hash(b"c"), "C")
+    # "b" was the least recently used entry
+    assert cache.get("extract", content_hash(b"b")) is ResultCache.MISSING
+    assert cache.get("extract", content_hash(b"a")) == "A"
+    assert cache.get("other", content_hash(b"a")) is ResultCache.MISSING
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_result_cache_sqlite_tier_is_shared(tmp_path):
+    db_path = tmp_path / "cache.sqlite"
+    writer = ResultCache(max_entries=0, db_path=db_path)
+    writer.put("language", content_hash("some text"), ("en", 0.9))
+    writer.flush()
+
+    reader = ResultCache(max_entries=10, db_path=db_path)
+    assert reader.get("language", content_hash("some text")) == ("en", 0.9)
+    assert reader.get("language", content_hash("other text")) is ResultCache.MISSING
+
+
+def test_result_cache_writers_do_not_block_each_other(tmp_path):
+    db_path = tmp_path / "cache.sqlite"
+    first = ResultCache(max_entries=0, db_path=db_path, commit_every=100)
+    second = ResultCache(max_entries=0, db_path=db_path, commit_every=100)
+    # The first writer is midway through a batch...
+    for i in range(50):
+        first.put("extract", content_hash(f"first {i}"), i)
+    assert first.get("extract", content_hash("first 3")) == 3
+
+    # ...which must not hold the file's write lock while the second one writes
+    start = time.perf_counter()
+    for i in range(100):
+        second.put("extract", content_hash(f"second {i}"), i)
+    second.flush()
+    assert time.perf_counter() - start < 5
+    first.flush()
+
+    reader = ResultCache(max_entries=0, db_path=db_path)
+    assert reader.get("extract", content_hash("first 49")) == 49
+    assert reader.get("extract", content_hash("second 99")) == 99
+
+
+def test_filter_cascade_uses_cache_for_repeated_texts():
+    calls = []
+
+    def predicate(text):
+        calls.append(text)
+        return "spam" not in text, len(text)
+
+    cascade = FilterCascade([FilterStage("spam", predicate)], retune_every=None)
+    cache = ResultCache()
+    first = cascade.run_batch(["good page", "spam page"], cache=cache)
+    second = cascade.run_batch(["spam page", "good page", "new page"], cache=cache)
+    assert calls == ["good page", "spam page", "new page"]
+    assert first[0].tolist() == [True, False]
+    assert second[0].tolist() == [False, True, True]
+    assert second[1] == ["spam", None, None]
+    assert second[2][1] == {"spam": 9}
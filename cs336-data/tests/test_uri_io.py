@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import logging
+import os
+
+import pytest
+import requests
+
+from cs336_data import uri_io
+from cs336_data.manifest import ShardManifest
+from cs336_data.uri_io import is_local, open_uri, stat_uri
+from cs336_data.warc_reader import index_warc_chunks, read_record_payloads
+
+from .common import serve_directory, write_test_warc
+
+logger = logging.getLogger(__name__)
+
+
+def test_open_uri_http_range_reads(tmp_path):
+    data = os.urandom(100_000)
+    (tmp_path / "blob.bin").write_bytes(data)
+    with serve_directory(tmp_path) as base_url:
+        url = f"{base_url}/blob.bin"
+        assert not is_local(url)
+        assert stat_uri(url)[0] == len(data)
+        with open_uri(url, block_size=4096) as f:
+            f.seek(50_000)
+            assert f.read(10) == data[50_000:50_010]
+            f.seek(10)
+            assert f.read(70_000) == data[10:70_010]
+            assert f.read() == data[70_010:]
+
+
+def test_stat_uri_without_content_length(monkeypatch):
+    response = requests.Response()
+    response.status_code = 200
+    monkeypatch.setattr(uri_io, "_request", lambda method, url, headers=None: response)
+    with pytest.raises(OSError, match="http://example.com/blob.bin"):
+        stat_uri("http://example.com/blob.bin")
+
+
+def test_read_record_payloads_over_http(tmp_path):
+    pages = [(f"http://example.com/{i}", f"<html><body><p>page {i}</p></body></html>") for i in range(20)]
+    warc_path = write_test_warc(tmp_path / "test.warc.gz", pages)
+    local = [record.payload for record in read_record_payloads(f"file://{warc_path}")]
+    with serve_directory(tmp_path) as base_url:
+        url = f"{base_url}/test.warc.gz"
+        assert index_warc_chunks(url) == [(0, None)]
+        remote = [record.payload for record in read_record_payloads(url)]
+        manifest = ShardManifest.load_or_create(tmp_path / "test.manifest.json", url, tmp_path / "out.parquet")
+        assert manifest.data["size"] == os.path.getsize(warc_path)
+    assert remote == local == [html.encode("utf-8") for _, html in pages]
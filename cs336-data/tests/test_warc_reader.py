@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import logging
+
+import pytest
+
+from cs336_data.warc_reader import (
+    header_skip_reason,
+    in_sample,
+    index_warc_chunks,
+    iter_warc_records,
+    prefetch,
+    read_record_payloads,
+    sample_fraction,
+)
+
+from .common import write_test_warc
+
+logger = logging.getLogger(__name__)
+
+
+def _pages(n):
+    return [(f"http://example.com/{i}", f"<html><body><p>page {i}</p></body></html>") for i in range(n)]
+
+
+def test_index_warc_chunks_covers_all_records(tmp_path):
+    warc_path = write_test_warc(tmp_path / "test.warc.gz", _pages(10))
+    chunks = index_warc_chunks(warc_path, records_per_chunk=3)
+    assert len(chunks) == 4
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] is None
+    for (_, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end == next_start
+
+    urls = []
+    for start, end in chunks:
+        for _, record in iter_warc_records(warc_path, start, end):
+            urls.append(record.rec_headers.get_header("WARC-Target-URI"))
+    assert urls == [url for url, _ in _pages(10)]
+
+
+def test_iter_warc_records_uncompressed(tmp_path):
+    warc_path = write_test_warc(tmp_path / "test.warc", _pages(5), gzip=False)
+    chunks = index_warc_chunks(warc_path, records_per_chunk=2)
+    assert len(chunks) == 3
+    payloads = []
+    for start, end in chunks:
+        for _, record in iter_warc_records(warc_path, start, end):
+            payloads.append(record.content_stream().read())
+    assert payloads == [html.encode("utf-8") for _, html in _pages(5)]
+
+
+def test_header_skip_reason(tmp_path):
+    pages = [
+        ("http://example.com/ok", "<html><body>ok</body></html>"),
+        ("http://example.com/missing", "not found", "404 Not Found", "text/html"),
+        ("http://example.com/logo.png", b"\x89PNG", "200 OK", "image/png"),
+        ("http://example.com/big", "<html><body>" + "x" * 5000 + "</body></html>"),
+        ("http://example.com/xhtml", "<html><body>ok</body></html>", "200 OK", "application/xhtml+xml"),
+    ]
+    warc_path = write_test_warc(tmp_path / "test.warc.gz", pages)
+    reasons = [
+        header_skip_reason(record, max_content_length=1000)
+        for _, record in iter_warc_records(warc_path)
+    ]
+    assert reasons == [None, "http_status", "content_type", "content_length", None]
+
+
+def test_read_record_payloads_by_chunk(tmp_path):
+    pages = _pages(7) + [("http://example.com/missing", "gone", "404 Not Found", "text/html")]
+    for name, gzip in [("test.warc.gz", True), ("test.warc", False)]:
+        warc_path = write_test_warc(tmp_path / name, pages, gzip=gzip)
+        records = [
+            record
+            for start, end in index_warc_chunks(warc_path, records_per_chunk=3)
+            for record in read_record_payloads(warc_path, start, end, max_payload_bytes=1000)
+        ]
+        assert [record.url for record in records] == [page[0] for page in pages]
+        assert [record.payload for record in records[:7]] == [html.encode("utf-8") for _, html in _pages(7)]
+        assert records[0].content_type == "text/html; charset=utf-8"
+        assert records[-1].payload is None
+        assert records[-1].skip_reason == "http_status"
+
+
+def test_sampling_is_deterministic(tmp_path):
+    assert sample_fraction("http://example.com/0") == sample_fraction("http://example.com/0")
+    assert sample_fraction("http://example.com/0") != sample_fraction("http://example.com/0", seed=1)
+    fractions = [sample_fraction(f"http://example.com/{i}") for i in range(10000)]
+    assert all(0.0 <= f < 1.0 for f in fractions)
+    assert 0.08 < sum(f < 0.1 for f in fractions) / len(fractions) < 0.12
+
+    warc_path = write_test_warc(tmp_path / "test.warc.gz", _pages(200))
+    expected = [url for url, _ in _pages(200) if sample_fraction(url) < 0.25]
+    assert 20 < len(expected) < 80
+    assert [record.rec_headers.get_header("WARC-Target-URI")
+            for _, record in iter_warc_records(warc_path) if in_sample(record, 0.25)] == expected
+
+    # The sample does not depend on how the file is chunked
+    for records_per_chunk in (7, 1000):
+        records = [
+            record
+            for start, end in index_warc_chunks(warc_path, records_per_chunk)
+            for record in read_record_payloads(warc_path, start, end, sample_rate=0.25)
+        ]
+        assert len(records) == 200
+        assert [record.url for record in records if record.skip_reason is None] == expected
+        assert {record.skip_reason for record in records} == {None, "not_sampled"}
+
+
+def test_prefetch():
+    assert list(prefetch(range(1000), max_queued=8)) == list(range(1000))
+    assert list(prefetch(range(10), max_queued=0)) == list(range(10))
+
+    def failing():
+        yield 1
+        raise ValueError("broken record")
+
+    with pytest.raises(ValueError, match="broken record"):
+        list(prefetch(failing(), max_queued=8))
+
+    # Stopping early must not leave the producer blocked on a full queue
+    items = prefetch(iter(range(10**9)), max_queued=2)
+    assert next(items) == 0
+    items.close()